@@ -26,7 +26,7 @@ async function stamp(fields) {
 if (box && status !== 'Deleted') {
     const resp = await fetch(deleteUrl, {
         method: 'POST', headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ building_id: bldId })
+        body: JSON.stringify({ id: rec.id, building_id: bldId })
     });
     output.set('delete_status', resp.status);
     if (resp.ok) {
@@ -40,7 +40,7 @@ if (box && status !== 'Deleted') {
 } else if (!box && status === 'Deleted') {
     const resp = await fetch(restoreUrl, {
         method: 'POST', headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ building_id: bldId })
+        body: JSON.stringify({ id: rec.id, building_id: bldId })
     });
     output.set('restore_status', resp.status);
     if (resp.ok) {
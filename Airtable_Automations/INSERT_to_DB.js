@@ -63,7 +63,7 @@ if (fields?.building_id != null && String(fields.building_id).trim() !== "") {
 const res = await fetch(url, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ fields }),
+    body: JSON.stringify({ id: recObj?.id, fields }),  // record id: a retried run is replayed, not re-inserted
 });
 
 const text = await res.text();
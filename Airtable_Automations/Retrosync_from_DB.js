@@ -24,18 +24,29 @@ const ctrl = ctrlQ.records[0] ?? null;
 const sinceISO =
     ctrl?.getCellValue('Last Cursor')?.toISOString?.() ?? '1970-01-01T00:00:00Z';
 
-// Fetch changes
-const resp = await fetch(`${changesUrl}?since=${encodeURIComponent(sinceISO)}`);
-if (!resp.ok) {
-    output.set('ok', false);
-    output.set('status', resp.status);
-    output.set('error', 'changes endpoint failed');
-    return;
-}
-const data = await resp.json();
-const nowISO = data.now;
-const upserts = Array.isArray(data.upserts) ? data.upserts : [];
-const deletes = Array.isArray(data.deletes) ? data.deletes : [];
+// Fetch changes, one page at a time (server hands back next_cursor until done)
+const PAGE_LIMIT = 1000;
+let nowISO = null;
+const upserts = [];
+const deletes = [];
+let pageCursor = null;
+do {
+    const qs = pageCursor
+        ? `cursor=${encodeURIComponent(pageCursor)}`
+        : `since=${encodeURIComponent(sinceISO)}`;
+    const resp = await fetch(`${changesUrl}?${qs}&limit=${PAGE_LIMIT}`);
+    if (!resp.ok) {
+        output.set('ok', false);
+        output.set('status', resp.status);
+        output.set('error', 'changes endpoint failed');
+        return;
+    }
+    const data = await resp.json();
+    nowISO = data.now;
+    if (Array.isArray(data.upserts)) upserts.push(...data.upserts);
+    if (Array.isArray(data.deletes)) deletes.push(...data.deletes);
+    pageCursor = data.next_cursor ?? null;
+} while (pageCursor);
 
 // Build a quick index of existing Airtable rows by building_id
 const abQ = await buildings.selectRecordsAsync({ fields: ['building_id'] });
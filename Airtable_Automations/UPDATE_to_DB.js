@@ -22,7 +22,7 @@ if (fields['building_id'] == null) {
     const resp = await fetch(endpoint, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ fields })
+        body: JSON.stringify({ id: rec.id, fields })  // record id: a retried run is replayed, not re-applied
     });
 
     const raw = await resp.text();
@@ -0,0 +1,234 @@
+﻿import asyncio
+import threading
+import time
+from typing import AsyncIterator, Iterable, Iterator, Optional
+import httpx
+from metrics import observe_airtable
+
+AIRTABLE_PAGE_SIZE = 100  # Airtable's max records per list call
+
+
+def list_records(api_url: str, api_key: str, table: str, fields: Optional[Iterable[str]] = None,
+                 client: Optional[httpx.Client] = None, max_retries: int = 5) -> Iterator[dict]:
+    """
+    Yields every record of an Airtable table, following `offset` pagination.
+    `fields` limits the columns Airtable sends back. 429s are retried after Retry-After.
+    """
+    own_client = client is None
+    client = client or httpx.Client(timeout=30)
+    params = [("pageSize", str(AIRTABLE_PAGE_SIZE))]
+    params += [("fields[]", f) for f in (fields or [])]
+    offset = None
+    try:
+        while True:
+            page_params = params + ([("offset", offset)] if offset else [])
+            for attempt in range(max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    response = client.get(
+                        f"{api_url}{table}",
+                        headers={"Authorization": f"Bearer {api_key}"},
+                        params=page_params,
+                    )
+                except httpx.TransportError:
+                    observe_airtable("list", "error", time.perf_counter() - started)
+                    raise
+                observe_airtable("list", response.status_code, time.perf_counter() - started)
+                if response.status_code != 429 or attempt == max_retries:
+                    break
+                time.sleep(float(response.headers.get("Retry-After", 30)))
+            response.raise_for_status()
+            data = response.json()
+            yield from data.get("records", [])
+            offset = data.get("offset")
+            if not offset:
+                return
+    finally:
+        if own_client:
+            client.close()
+
+
+async def alist_records(api_url: str, api_key: str, table: str, fields: Optional[Iterable[str]] = None,
+                        client: Optional[httpx.AsyncClient] = None, max_retries: int = 5) -> AsyncIterator[dict]:
+    """Async list_records(): same paging and 429 handling on an httpx.AsyncClient."""
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=30)
+    params = [("pageSize", str(AIRTABLE_PAGE_SIZE))]
+    params += [("fields[]", f) for f in (fields or [])]
+    offset = None
+    try:
+        while True:
+            page_params = params + ([("offset", offset)] if offset else [])
+            for attempt in range(max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    response = await client.get(
+                        f"{api_url}{table}",
+                        headers={"Authorization": f"Bearer {api_key}"},
+                        params=page_params,
+                    )
+                except httpx.TransportError:
+                    observe_airtable("list", "error", time.perf_counter() - started)
+                    raise
+                observe_airtable("list", response.status_code, time.perf_counter() - started)
+                if response.status_code != 429 or attempt == max_retries:
+                    break
+                await asyncio.sleep(float(response.headers.get("Retry-After", 30)))
+            response.raise_for_status()
+            data = response.json()
+            for record in data.get("records", []):
+                yield record
+            offset = data.get("offset")
+            if not offset:
+                return
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+class AirtableIndex:
+    """
+    In-memory lookup of airtable_Building record ids, keyed on building_id and on
+    (Address Normalized, bld_number). Built once per sync instead of one GET per building.
+    """
+
+    def __init__(self, records: Iterable[dict]):
+        self.by_building_id = {}
+        self.by_address = {}
+        self.count = 0
+        for record in records:
+            self.count += 1
+            f = record.get("fields", {})
+            if f.get("building_id") is not None:
+                self.by_building_id.setdefault(str(f["building_id"]), record["id"])
+            if f.get("Address Normalized") is not None:
+                self.by_address.setdefault((f["Address Normalized"], f.get("bld_number")), record["id"])
+
+    def find(self, building_id=None, address_normalized=None, bld_number=None) -> Optional[str]:
+        if building_id is not None:
+            rec_id = self.by_building_id.get(str(building_id))
+            if rec_id:
+                return rec_id
+        return self.by_address.get((address_normalized, bld_number))
+
+
+AIRTABLE_BATCH_SIZE = 10     # Airtable's max records per create/update call
+AIRTABLE_RATE_PER_SEC = 5    # Airtable's per-base request limit
+UNSENT_ERRORS = (httpx.ConnectError, httpx.PoolTimeout)  # the request never reached Airtable
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = None
+        self._loop = None
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. after a 429 (Airtable wants the whole base to back off)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # shared buckets outlive an event loop (tests, lifespans)
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_base_limiters = {}
+_base_limiters_lock = threading.Lock()
+
+def base_limiter(api_url: str) -> TokenBucket:
+    """The process-wide TokenBucket for one base (api_url ends in /v0/<base>/), shared by every write."""
+    with _base_limiters_lock:
+        limiter = _base_limiters.get(api_url)
+        if limiter is None:
+            limiter = _base_limiters[api_url] = TokenBucket(AIRTABLE_RATE_PER_SEC)
+        return limiter
+
+
+def chunked(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def write_records(api_url: str, api_key: str, table: str, updates: list, creates: list,
+                        client: Optional[httpx.AsyncClient] = None, limiter: Optional[TokenBucket] = None,
+                        concurrency: int = AIRTABLE_RATE_PER_SEC, max_retries: int = 5) -> list:
+    """
+    Pushes records to Airtable in 10-record batches, concurrently but under the
+    5 requests/second limit, which base_limiter() shares with every other write to the base.
+    updates are {"id", "fields"}, creates are {"fields"}.
+    429 waits Retry-After (Airtable asks for 30s); 5xx/transport errors back off exponentially.
+    Creates are only retried when the request never reached Airtable (429, ConnectError,
+    PoolTimeout): after a 5xx or a read/write timeout the records may exist, so the batch
+    comes back ok=False with the error for the caller to reconcile instead of duplicating it.
+    Returns one outcome dict per batch: {op, count, ok, status, record_ids, error}.
+    """
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=30)
+    limiter = limiter or base_limiter(api_url)
+    gate = asyncio.Semaphore(concurrency)
+    url = f"{api_url}{table}"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    async def send(op: str, method: str, batch: list) -> dict:
+        outcome = {"op": op, "count": len(batch), "ok": False, "status": None, "record_ids": [], "error": None}
+        async with gate:
+            for attempt in range(max_retries + 1):
+                await limiter.acquire()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, headers=headers, json={"records": batch})
+                except httpx.TransportError as e:
+                    observe_airtable(op, "error", time.perf_counter() - started)
+                    outcome["error"] = str(e)
+                    if op == "create" and not isinstance(e, UNSENT_ERRORS):
+                        break
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                    continue
+                observe_airtable(op, response.status_code, time.perf_counter() - started)
+                outcome["status"] = response.status_code
+                if response.status_code == 429:
+                    limiter.pause(float(response.headers.get("Retry-After", 30)))
+                    continue
+                if response.status_code >= 500:
+                    if op == "create":
+                        outcome["error"] = response.text
+                        break
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                    continue
+                if response.status_code == 200:
+                    outcome["ok"] = True
+                    outcome["error"] = None
+                    outcome["record_ids"] = [r["id"] for r in response.json().get("records", [])]
+                else:
+                    outcome["error"] = response.text
+                break
+            else:
+                outcome["error"] = outcome["error"] or f"gave up after {max_retries} retries"
+        return outcome
+
+    try:
+        jobs = [send("update", "PATCH", b) for b in chunked(updates, AIRTABLE_BATCH_SIZE)]
+        jobs += [send("create", "POST", b) for b in chunked(creates, AIRTABLE_BATCH_SIZE)]
+        return list(await asyncio.gather(*jobs))
+    finally:
+        if own_client:
+            await client.aclose()
@@ -0,0 +1,134 @@
+﻿"""
+Per-request CPU of the field-mapping code: the old inline alias/colmap loops
+vs the compiled field_maps codecs. No DB or network.
+
+    python benchmarks/bench_field_maps.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from field_maps import BUILDING  # noqa: E402
+
+AIRTABLE_RECORD = {
+    "Address Normalized": "123 MAIN ST, CHARLESTON, WV 25301",
+    "Bld#": 1,
+    "Owner Occupied": True,
+    "Street Address": "123 Main St",
+    "City": "Charleston",
+    "State": "WV",
+    "Zip": "25301",
+    "County": "Kanawha",
+    "Units": 12,
+    "construction_code": 2,
+    "Year Built": 1998,
+    "Stories": 3,
+    "Square Feet": 14000,
+    "Desired Building Coverage": 2500000,
+    "Fire Alarm": 1,
+    "Sprinkler System": 0,
+    "entity_id": 7,
+    "building_id": 42,
+}
+
+FEED_ROW = (
+    42, None, "123 MAIN ST, CHARLESTON, WV 25301", 1, 1, "123 Main St", "Charleston", "WV", "25301",
+    "Kanawha", 12, 2, 1998, 3, 14000, Decimal("2500000"), 1, 0, None, None, None, None, 7, "Acme LLC",
+    0, datetime(2025, 9, 27, 23, 10), "2025-09-27T23:10:00.0000000",
+)
+FEED_COLS = [
+    "building_id", "mortgagee_id", "Address Normalized", "Bld#", "Owner Occupied", "Street Address", "City",
+    "State", "Zip", "County", "Units", "construction_code", "Year Built", "Stories", "Square Feet",
+    "Desired Building Coverage", "Fire Alarm", "Sprinkler System", "roof_year_updated", "plumbing_year_updated",
+    "electrical_year_updated", "hvac_year_updated", "entity_id", "Entity Legal Name", "is_deleted", "updated_at",
+    "cursor_ts",
+]
+
+
+# ---- the pre-registry code paths, as they were in main.py ----
+
+def legacy_decode(fields):
+    fields = dict(fields or {})
+    aliases = {
+        "Address Normalized": "address_normalized", "Bld#": "bld_number", "Owner Occupied": "owner_occupied",
+        "Street Address": "street_address", "Zip": "zip_code", "Square Feet": "square_feet",
+        "Year Built": "year_built", "Desired Building Coverage": "desired_building_coverage",
+        "Fire Alarm": "fire_alarm", "Sprinkler System": "sprinkler_system", "City": "city", "State": "state",
+        "County": "county", "Units": "units", "Stories": "stories",
+    }
+    for old, new in aliases.items():
+        if old in fields and new not in fields:
+            fields[new] = fields[old]
+    norm = {}
+    for k, v in fields.items():
+        kk = k.strip()
+        if kk == "Bld#":
+            norm["bld_number"] = v
+            continue
+        if kk == "Zip":
+            norm["zip_code"] = v
+            continue
+        norm[kk.lower().replace(" ", "_")] = v
+    fields = norm
+    colmap = {
+        "mortgagee_id": "mortgagee_id", "address_normalized": "Address Normalized", "bld_number": "Bld#",
+        "owner_occupied": "Owner Occupied", "street_address": "Street Address", "city": "City", "state": "State",
+        "zip_code": "Zip", "county": "County", "units": "Units", "construction_code": "construction_code",
+        "year_built": "Year Built", "stories": "Stories", "square_feet": "Square Feet",
+        "desired_building_coverage": "Desired Building Coverage", "fire_alarm": "Fire Alarm",
+        "sprinkler_system": "Sprinkler System", "roof_year_updated": "roof_year_updated",
+        "plumbing_year_updated": "plumbing_year_updated", "electrical_year_updated": "electrical_year_updated",
+        "hvac_year_updated": "hvac_year_updated", "entity_id": "entity_id",
+    }
+    cols, vals = [], []
+    for api_key, sql_col in colmap.items():
+        if api_key in fields:
+            val = fields[api_key]
+            if api_key in ("owner_occupied", "fire_alarm", "sprinkler_system") and val is not None:
+                val = int(bool(val))
+            cols.append(sql_col)
+            vals.append(val)
+    return cols, vals
+
+def legacy_encode(values):
+    r = dict(zip(FEED_COLS, values))
+    payload = {k: r[k] for k in FEED_COLS[:24]}
+    payload["updated_at"] = r["updated_at"].isoformat()
+    if r["is_deleted"]:
+        return "delete", {"building_id": r["building_id"], "updated_at": payload["updated_at"]}
+    return "upsert", payload
+
+
+def codec_decode(fields):
+    return BUILDING.to_sql(BUILDING.decode(fields))
+
+def codec_encode(values):
+    return BUILDING.feed_encoder(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    assert legacy_decode(AIRTABLE_RECORD) == codec_decode(AIRTABLE_RECORD)
+    assert legacy_encode(FEED_ROW) == codec_encode(FEED_ROW)
+
+    cases = [
+        ("ingest/update decode", legacy_decode, codec_decode, AIRTABLE_RECORD),
+        ("changes row encode", legacy_encode, codec_encode, FEED_ROW),
+    ]
+    print(f"{'case':<22}{'legacy us':>12}{'codec us':>12}{'speedup':>10}")
+    for name, old, new, arg in cases:
+        t_old = min(timeit.repeat(lambda: old(arg), number=args.number, repeat=5)) / args.number * 1e6
+        t_new = min(timeit.repeat(lambda: new(arg), number=args.number, repeat=5)) / args.number * 1e6
+        print(f"{name:<22}{t_old:>12.2f}{t_new:>12.2f}{t_old / t_new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
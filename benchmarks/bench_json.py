@@ -0,0 +1,115 @@
+﻿"""
+CPU cost per row of the JSON paths, old (FastAPI defaults, stdlib json) vs codec.py.
+
+    python benchmarks/bench_json.py [--rows 5k]
+
+Feed rows come from a stand-in database seeded like benchmarks.run, read with the real
+BUILDING feed query, so the payloads have the production shape. Each path is timed
+--repeat times on process CPU time and the best run is reported in microseconds per row:
+  - feed_json     rows -> feed_encoder -> response body (jsonable_encoder + JSONResponse
+                  before; FastJSONResponse now)
+  - feed_ndjson   rows -> feed_encoder -> one line per row
+  - ingest_parse  a batch ingest body -> dict (json.loads before; codec.loads now)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import codec  # noqa: E402
+from benchmarks import portfolio, standin_db  # noqa: E402
+from field_maps import BUILDING  # noqa: E402
+
+
+def feed_rows(n: int, seed: int) -> list:
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-encode-"), "standin.db")
+    standin_db.create_database(path)
+    portfolio.seed_database(path, n, seed=seed)
+    conn = standin_db.connect(f"DATABASE={path}")
+    try:
+        cur = conn.cursor()
+        cur.execute(BUILDING.feed_query("", "1 = 1"), ["9999-12-31T00:00:00"])
+        return cur.fetchall()
+    finally:
+        conn.close()
+        os.remove(path)
+
+def best_of(repeat: int, fn) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def measure(rows: list, repeat: int, seed: int) -> list:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    encode = BUILDING.feed_encoder
+
+    def payload():
+        upserts, deletes = [], []
+        for r in rows:
+            op, data = encode(r)
+            (deletes if op == "delete" else upserts).append(data)
+        return {"now": "2025-01-01T00:00:00+00:00", "upserts": upserts, "deletes": deletes, "next_cursor": None}
+
+    def old_ndjson():
+        dumps = lambda o: json.dumps(o, default=codec.default, separators=(",", ":")) + "\n"
+        return "".join(dumps({"op": op, "data": data}) for op, data in map(encode, rows)).encode("utf-8")
+
+    def new_ndjson():
+        return b"".join(codec.dumps_line({"op": op, "data": data}) for op, data in map(encode, rows))
+
+    assert json.loads(JSONResponse(jsonable_encoder(payload())).body) == json.loads(codec.FastJSONResponse(payload()).body)
+    assert [json.loads(l) for l in old_ndjson().splitlines()] == [json.loads(l) for l in new_ndjson().splitlines()]
+
+    rng = random.Random(seed)
+    records = [{"fields": portfolio.building_fields(i, rng, 50)} for i in range(len(rows))]
+    body = json.dumps({"records": records}).encode("utf-8")
+
+    cases = [
+        ("feed_json", lambda: JSONResponse(jsonable_encoder(payload())).body, lambda: codec.FastJSONResponse(payload()).body),
+        ("feed_ndjson", old_ndjson, new_ndjson),
+        ("ingest_parse", lambda: json.loads(body), lambda: codec.loads(body)),
+    ]
+    out = []
+    for name, old, new in cases:
+        before, after = best_of(repeat, old), best_of(repeat, new)
+        out.append({
+            "case": name,
+            "before_us_per_row": round(before / len(rows) * 1e6, 2),
+            "after_us_per_row": round(after / len(rows) * 1e6, 2),
+            "speedup": round(before / after, 2) if after else None,
+        })
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", default="5k", help="feed rows / ingest records to encode (default 5k)")
+    ap.add_argument("--repeat", type=int, default=5, help="runs per path; the fastest counts (default 5)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default=None, help="also write the results as JSON here")
+    args = ap.parse_args(argv)
+
+    rows = feed_rows(portfolio.parse_size(args.rows), args.seed)
+    results = measure(rows, args.repeat, args.seed)
+    print(f"{len(rows)} rows, serializer: {'orjson' if codec.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'case':<14} {'before us/row':>14} {'after us/row':>13} {'speedup':>8}")
+    for r in results:
+        print(f"{r['case']:<14} {r['before_us_per_row']:>14.2f} {r['after_us_per_row']:>13.2f} {r['speedup']:>7.2f}x")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"rows": len(rows), "orjson": codec.orjson is not None, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+﻿"""
+In-memory Airtable REST stand-in for offline benchmarks.
+
+Implements the calls airtable_client makes against /v0/<base>/<table>:
+  GET    list with pageSize / offset / fields[]
+  PATCH  update up to 10 records
+  POST   create up to 10 records
+Optional per-base rate limit (429 + Retry-After, like Airtable's 5 req/s) and latency.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MAX_BATCH = 10
+MAX_PAGE = 100
+
+
+class FakeAirtable:
+    def __init__(self, base_id: str = "appBENCH", rate_per_sec: float = 0.0, latency_ms: float = 0.0):
+        self.base_id = base_id
+        self.rate_per_sec = rate_per_sec
+        self.latency = latency_ms / 1000.0
+        self.tables = {}   # table -> {record_id: fields}
+        self._order = {}   # table -> [record_id] in creation order, for offset paging
+        self.requests = {"GET": 0, "PATCH": 0, "POST": 0, "429": 0}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._window = []  # request times in the last second
+        self._server = None
+        self._thread = None
+
+    # ---- data ----
+
+    def _new_id(self) -> str:
+        self._next_id += 1
+        return f"rec{self._next_id:014d}"
+
+    def seed(self, table: str, records: list):
+        with self._lock:
+            rows = self.tables.setdefault(table, {})
+            order = self._order.setdefault(table, [])
+            for fields in records:
+                rec_id = self._new_id()
+                rows[rec_id] = dict(fields)
+                order.append(rec_id)
+
+    # ---- server ----
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v0/{self.base_id}/"
+
+    def start(self) -> "FakeAirtable":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: dict, headers: dict = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str):
+                body = None
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = json.loads(self.rfile.read(length))
+                status, payload, headers = fake.handle(method, self.path, body)
+                self._reply(status, payload, headers)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-airtable", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # ---- request handling (also callable without HTTP) ----
+
+    def _rate_limited(self) -> bool:
+        if not self.rate_per_sec:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_per_sec:
+                self.requests["429"] += 1
+                return True
+            self._window.append(now)
+        return False
+
+    def handle(self, method: str, path: str, body: dict = None):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._rate_limited():
+            return 429, {"errors": [{"error": "RATE_LIMIT_REACHED"}]}, {"Retry-After": "1"}
+        url = urlparse(path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "v0" or parts[1] != self.base_id:
+            return 404, {"error": "NOT_FOUND"}, None
+        table = parts[2]
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            rows = self.tables.setdefault(table, {})
+            order = self._order.setdefault(table, [])
+            if method == "GET":
+                return 200, self._list(rows, order, parse_qs(url.query)), None
+            records = (body or {}).get("records") or []
+            if len(records) > MAX_BATCH:
+                return 422, {"error": {"type": "INVALID_RECORDS", "message": "max 10 records per request"}}, None
+            out = []
+            for rec in records:
+                if method == "PATCH":
+                    if rec.get("id") not in rows:
+                        return 404, {"error": {"type": "ROW_DOES_NOT_EXIST", "message": rec.get("id")}}, None
+                    rows[rec["id"]].update(rec.get("fields") or {})
+                    rec_id = rec["id"]
+                else:
+                    rec_id = self._new_id()
+                    rows[rec_id] = dict(rec.get("fields") or {})
+                    order.append(rec_id)
+                out.append({"id": rec_id, "fields": rows[rec_id]})
+            return 200, {"records": out}, None
+
+    def _list(self, rows: dict, order: list, query: dict) -> dict:
+        size = min(int((query.get("pageSize") or [MAX_PAGE])[0]), MAX_PAGE)
+        start = int((query.get("offset") or ["0"])[0])
+        fields = query.get("fields[]")
+        ids = order[start:start + size]
+        records = []
+        for rec_id in ids:
+            f = rows[rec_id]
+            if fields:
+                f = {k: f[k] for k in fields if k in f}
+            records.append({"id": rec_id, "fields": f})
+        page = {"records": records}
+        if start + size < len(order):
+            page["offset"] = str(start + size)
+        return page
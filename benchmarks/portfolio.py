@@ -0,0 +1,167 @@
+﻿"""
+Synthetic portfolios for the benchmark stand-in database and fake Airtable base.
+Deterministic for a given (buildings, seed).
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+STATES = ["WV", "OH", "PA", "VA", "KY", "MD"]
+CITIES = ["Charleston", "Huntington", "Morgantown", "Parkersburg", "Wheeling", "Beckley", "Clarksburg"]
+STREETS = ["Main", "Oak", "Maple", "Washington", "Lincoln", "Kanawha", "Virginia", "Quarrier", "Lee", "Court"]
+SUFFIXES = ["St", "Ave", "Blvd", "Rd", "Dr", "Ln"]
+CHUNK = 10_000
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '1m' -> 1000000, '2500' -> 2500."""
+    text = str(text).strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+def address(i: int) -> dict:
+    """Unique, stable address for building number i."""
+    street = f"{100 + i % 9900} {STREETS[i % len(STREETS)]} {SUFFIXES[(i // 10) % len(SUFFIXES)]}"
+    city = CITIES[(i // 60) % len(CITIES)]
+    state = STATES[(i // 420) % len(STATES)]
+    zip_code = f"{25000 + (i // 9900) % 75000:05d}"
+    return {
+        "street_address": street,
+        "city": city,
+        "state": state,
+        "zip_code": zip_code,
+        "address_normalized": f"{street}, {city}, {state} {zip_code}",
+    }
+
+def building_fields(i: int, rng: random.Random, entity_count: int) -> dict:
+    """Airtable-shaped fields for building i (what /airtable/buildings/ingest receives)."""
+    a = address(i)
+    return {
+        "Address Normalized": a["address_normalized"],
+        "Bld#": 1,
+        "Owner Occupied": rng.random() < 0.3,
+        "Street Address": a["street_address"],
+        "City": a["city"],
+        "State": a["state"],
+        "Zip": a["zip_code"],
+        "County": f"{a['city']} County",
+        "Units": rng.randint(1, 48),
+        "construction_code": rng.randint(1, 6),
+        "Year Built": rng.randint(1900, 2024),
+        "Stories": rng.randint(1, 6),
+        "Square Feet": rng.randint(800, 60_000),
+        "Desired Building Coverage": rng.randint(1, 400) * 10_000,
+        "Fire Alarm": rng.random() < 0.7,
+        "Sprinkler System": rng.random() < 0.4,
+        "entity_id": rng.randint(1, entity_count) if entity_count else None,
+    }
+
+def _ts(base: datetime, seconds: float) -> str:
+    return (base + timedelta(seconds=seconds)).isoformat(timespec="microseconds")
+
+
+def seed_database(path: str, buildings: int, seed: int = 7, deleted_ratio: float = 0.02) -> dict:
+    """
+    Fills the stand-in with `buildings` buildings plus proportional entities, contacts and
+    building contacts. updated_at is spread over the past year (with ties) so the
+    */changes feeds page realistically. Returns row counts.
+    """
+    rng = random.Random(seed)
+    entities = max(1, buildings // 20)
+    contacts = max(1, buildings // 5)
+    links = buildings // 2
+    base = datetime.utcnow() - timedelta(days=365)
+    span = 365 * 86400
+
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA synchronous=OFF")
+
+        rows = [
+            (f"Entity {i} LLC", rng.choice(STATES), f"20{rng.randint(0, 24):02d}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+             f"{rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}", f"https://sos.example/{i}",
+             int(rng.random() < deleted_ratio), _ts(base, rng.random() * span))
+            for i in range(1, entities + 1)
+        ]
+        db.executemany(
+            "INSERT INTO [Entity] ([legal_name], [State Registration], [Entity Start Date], [FEIN], [sos_url], "
+            "[is_deleted], [updated_at]) VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+        )
+
+        sql = (
+            "INSERT INTO [Building] ([Address Normalized], [Bld#], [Owner Occupied], [Street Address], [City], [State], "
+            "[Zip], [County], [Units], [construction_code], [Year Built], [Stories], [Square Feet], "
+            "[Desired Building Coverage], [Fire Alarm], [Sprinkler System], [entity_id], [is_deleted], [updated_at]) "
+            "VALUES (" + ", ".join("?" * 19) + ")"
+        )
+        for start in range(1, buildings + 1, CHUNK):
+            batch = []
+            for i in range(start, min(start + CHUNK, buildings + 1)):
+                f = building_fields(i, rng, entities)
+                # whole-second timestamps every ~50 rows so keyset paging sees ties
+                at = float(int(rng.random() * span)) if i % 50 == 0 else rng.random() * span
+                batch.append((
+                    f["Address Normalized"], 1, int(f["Owner Occupied"]), f["Street Address"], f["City"], f["State"],
+                    f["Zip"], f["County"], f["Units"], f["construction_code"], f["Year Built"], f["Stories"],
+                    f["Square Feet"], f["Desired Building Coverage"], int(f["Fire Alarm"]), int(f["Sprinkler System"]),
+                    f["entity_id"], int(rng.random() < deleted_ratio), _ts(base, at),
+                ))
+            db.executemany(sql, batch)
+
+        rows = [
+            (f"First{i}", f"Last{i}", f"{100 + i} Mail St", None, f"304-555-{i % 10000:04d}", f"contact{i}@example.com",
+             1, None, int(rng.random() < deleted_ratio), _ts(base, rng.random() * span))
+            for i in range(1, contacts + 1)
+        ]
+        db.executemany(
+            "INSERT INTO [ClientContact] ([first_name], [last_name], [mailing_address], [physical_address], [phone], "
+            "[email], [is_primary], [parent_contact_id], [is_deleted], [updated_at]) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+        for start in range(0, links, CHUNK):
+            batch = [
+                (rng.randint(1, buildings), rng.randint(1, contacts), rng.choice(["owner", "manager", "tenant"]),
+                 int(rng.random() < 0.5), int(rng.random() > deleted_ratio), _ts(base, rng.random() * span))
+                for _ in range(start, min(start + CHUNK, links))
+            ]
+            db.executemany(
+                "INSERT INTO [Building_Contact] ([building_id], [client_contact_id], [role], [is_primary], [is_active], "
+                "[updated_at]) VALUES (?, ?, ?, ?, ?, ?)", batch,
+            )
+        db.commit()
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+    return {"Building": buildings, "Entity": entities, "ClientContact": contacts, "Building_Contact": links}
+
+def airtable_building_records(buildings: int, count: int, seed: int = 7) -> list:
+    """
+    airtable_Building records for the fake base: the first `count` buildings, so a pull
+    updates those rows and a push updates them and creates the rest.
+    """
+    rng = random.Random(seed + 1)
+    entities = max(1, buildings // 20)
+    out = []
+    for i in range(1, count + 1):
+        f = building_fields(i, rng, entities)
+        out.append({
+            "building_id": i,
+            "Address Normalized": f["Address Normalized"],
+            "bld_number": 1,
+            "owner_occupied": int(f["Owner Occupied"]),
+            "street_address": f["Street Address"],
+            "city": f["City"],
+            "state": f["State"],
+            "zip_code": f["Zip"],
+            "county": f["County"],
+            "units": f["Units"],
+            "construction_code": f["construction_code"],
+            "year_built": f["Year Built"],
+            "stories": f["Stories"],
+            "square_feet": f["Square Feet"],
+            "desired_building_coverage": f["Desired Building Coverage"],
+            "fire_alarm": int(f["Fire Alarm"]),
+            "sprinkler_system": int(f["Sprinkler System"]),
+        })
+    return out
@@ -0,0 +1,456 @@
+﻿"""
+Offline throughput/latency benchmarks for the FastAPI app.
+
+    python -m benchmarks.run --buildings 10k --requests 2000 --concurrency 16
+    python -m benchmarks.run --compare benchmarks/results/OLD.json --fail-on-regression 15
+
+Spins main.app up in-process against:
+  - a SQLite stand-in derived from DATABASESCRIPT.sql (benchmarks/standin_db.py),
+    seeded with a synthetic portfolio (benchmarks/portfolio.py)
+  - a local fake Airtable base (benchmarks/fake_airtable.py)
+and drives it through httpx's ASGI transport with closed-loop workers. Each scenario
+reports requests/sec and p50/p95/p99 latency; the sync routines run once and report
+records/sec next to the floor Airtable's 5 req/s limit puts under them.
+
+Results are written as JSON (default benchmarks/results/<timestamp>-<commit>.json).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks import fake_airtable, portfolio, standin_db
+
+SUITE_VERSION = 1
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+WRITE_SCENARIOS = [
+    "ingest", "ingest_batch", "update", "update_batch", "soft_delete", "restore",
+    "entity_ingest", "entity_update", "clientcontact_ingest", "clientcontact_update",
+]
+FEED_SCENARIOS = [
+    "buildings_changes", "entity_changes", "clientcontact_changes", "building_contact_changes",
+    "buildings_changes_ndjson", "buildings_changes_poll", "buildings_changes_fields", "all_changes",
+]
+SYNC_SCENARIOS = ["fetch_buildings_from_airtable", "sync_buildings_to_airtable"]
+FEED_PATHS = {
+    "buildings_changes": "/airtable/buildings/changes",
+    "entity_changes": "/airtable/entity/changes",
+    "clientcontact_changes": "/airtable/clientcontact/changes",
+    "building_contact_changes": "/airtable/building_contact/changes",
+    "buildings_changes_ndjson": "/airtable/buildings/changes",
+    "buildings_changes_poll": "/airtable/buildings/changes",
+    "buildings_changes_fields": "/airtable/buildings/changes",
+    "all_changes": "/airtable/changes",
+}
+INGEST_BATCH = 100
+FEED_PAGE = 1000
+NARROW_FIELDS = "Address Normalized,Units,Year Built"  # a typical single-purpose automation
+
+
+# ---- environment ----
+
+def git_info() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def load_app(db_path: str, airtable_url: str):
+    """Imports main against the stand-in; main reads its settings at import time."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "CONN_STR": f"DATABASE={db_path}",
+        "AIRTABLE_API_KEY": "keyBENCH",
+        "AIRTABLE_BASE_ID": "appBENCH",
+        "AIRTABLE_API_URL": airtable_url,
+    })
+    standin_db.install(db_path)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+    # a developer .env is loaded with override=True; point main back at the stand-ins
+    main.CONN_STR = f"DATABASE={db_path}"
+    main.AIRTABLE_API_URL = airtable_url
+    main.AIRTABLE_API_KEY = "keyBENCH"
+    main.database.configure_engine(f"sqlite:///{db_path}")
+    return main
+
+
+# ---- measurement ----
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def summarize(latencies: list, statuses: dict, errors: int, seconds: float, concurrency: int, items: int = 0) -> dict:
+    lat = sorted(x * 1000.0 for x in latencies)
+    out = {
+        "requests": len(lat),
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "rps": round(len(lat) / seconds, 2) if seconds else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(lat, 50), 3),
+            "p95": round(percentile(lat, 95), 3),
+            "p99": round(percentile(lat, 99), 3),
+            "mean": round(sum(lat) / len(lat), 3) if lat else 0.0,
+            "max": round(lat[-1], 3) if lat else 0.0,
+        },
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+    }
+    if items:
+        out["items_per_sec"] = round(items / seconds, 2) if seconds else 0.0
+    return out
+
+async def drive(client: httpx.AsyncClient, make, requests: int, concurrency: int, check=None) -> dict:
+    """
+    Closed loop: `concurrency` workers each send the next request as soon as the last
+    one answers. make(i, worker) -> (method, url, kwargs); check(worker, response) can
+    read the body (e.g. to follow next_cursor) and returns the number of items handled.
+    """
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+    errors = items = 0
+
+    async def worker(w: int):
+        nonlocal errors, items
+        state = {}
+        for i in counter:
+            method, url, kwargs = make(i, state)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                body = await response.aread()
+            except Exception:
+                latencies.append(time.perf_counter() - start)
+                statuses["exception"] = statuses.get("exception", 0) + 1
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                errors += 1
+            elif check is not None:
+                items += check(state, response, body) or 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return summarize(latencies, statuses, errors, time.perf_counter() - start, concurrency, items)
+
+
+# ---- scenarios ----
+
+class Portfolio:
+    """What the scenarios need to know about the seeded data, plus fresh-key counters."""
+
+    def __init__(self, rows: dict, seed: int):
+        self.rows = rows
+        self.rng = random.Random(seed)
+        self.next_building = rows["Building"] + 1   # address index for new buildings
+        self.next_entity = rows["Entity"] + 1
+        self.next_contact = rows["ClientContact"] + 1
+        ids = list(range(1, rows["Building"] + 1))
+        self.rng.shuffle(ids)
+        self.delete_ids = ids
+
+    def new_building(self) -> dict:
+        i, self.next_building = self.next_building, self.next_building + 1
+        return portfolio.building_fields(i, self.rng, self.rows["Entity"])
+
+
+def write_scenario(name: str, p: Portfolio):
+    rng = p.rng
+    n_buildings, n_entities, n_contacts = p.rows["Building"], p.rows["Entity"], p.rows["ClientContact"]
+
+    if name == "ingest":
+        return lambda i, s: ("POST", "/airtable/buildings/ingest", {"json": {"fields": p.new_building()}}), None
+    if name == "ingest_batch":
+        def make(i, s):
+            return "POST", "/airtable/buildings/ingest", {"json": {"records": [{"fields": p.new_building()} for _ in range(INGEST_BATCH)]}}
+        return make, lambda s, r, b: INGEST_BATCH
+    if name == "update":
+        return lambda i, s: ("POST", "/airtable/buildings/update", {"json": {"fields": {
+            "building_id": rng.randint(1, n_buildings), "Units": rng.randint(1, 48), "Stories": rng.randint(1, 6),
+        }}}), None
+    if name == "update_batch":
+        def make(i, s):
+            return "POST", "/airtable/buildings/update", {"json": {"records": [{"fields": {
+                "building_id": rng.randint(1, n_buildings), "Units": rng.randint(1, 48),
+            }} for _ in range(INGEST_BATCH)]}}
+        return make, lambda s, r, b: INGEST_BATCH
+    if name == "soft_delete":
+        return lambda i, s: ("POST", "/airtable/buildings/delete", {"json": {"building_id": p.delete_ids[i % n_buildings]}}), None
+    if name == "restore":
+        return lambda i, s: ("POST", "/airtable/buildings/restore", {"json": {"building_id": p.delete_ids[i % n_buildings]}}), None
+    if name == "entity_ingest":
+        def make(i, s):
+            k, p.next_entity = p.next_entity, p.next_entity + 1
+            return "POST", "/airtable/entity/ingest", {"json": {"fields": {
+                "legal_name": f"Entity {k} LLC", "State Registration": "WV", "FEIN": f"55-{k:07d}",
+            }}}
+        return make, None
+    if name == "entity_update":
+        return lambda i, s: ("POST", "/airtable/entity/update", {"json": {"fields": {
+            "entity_id": rng.randint(1, n_entities), "sos_url": f"https://sos.example/{i}",
+        }}}), None
+    if name == "clientcontact_ingest":
+        def make(i, s):
+            k, p.next_contact = p.next_contact, p.next_contact + 1
+            return "POST", "/airtable/clientcontact/ingest", {"json": {"fields": {
+                "First Name": f"First{k}", "Last Name": f"Last{k}", "Email": f"contact{k}@example.com", "is_primary": 1,
+            }}}
+        return make, None
+    if name == "clientcontact_update":
+        return lambda i, s: ("POST", "/airtable/clientcontact/update", {"json": {"fields": {
+            "client_contact_id": rng.randint(1, n_contacts), "Phone": f"304-555-{i % 10000:04d}",
+        }}}), None
+    raise KeyError(name)
+
+def poll_scenario(path: str):
+    """A caught-up poller: since = the last response's `now`, revalidated with If-None-Match."""
+    def make(i, s):
+        headers = {"If-None-Match": s["etag"]} if s.get("etag") else {}
+        return "GET", path, {"params": {"since": s.get("since") or "2000-01-01T00:00:00Z", "limit": FEED_PAGE}, "headers": headers}
+
+    def check(s, response, body):
+        if response.status_code == 304:
+            return 0
+        data = json.loads(body)
+        s["etag"] = response.headers.get("etag")
+        if data.get("next_cursor") is None:
+            s["since"] = data["now"]
+        return len(data.get("upserts", ())) + len(data.get("deletes", ()))
+
+    return make, check
+
+def feed_scenario(name: str):
+    """Each worker walks the feed with next_cursor and starts over at the end."""
+    path = FEED_PATHS[name]
+    if name.endswith("_poll"):
+        return poll_scenario(path)
+    ndjson = name.endswith("_ndjson")
+
+    def make(i, s):
+        params = {"limit": FEED_PAGE}
+        if s.get("cursor"):
+            params["cursor"] = s["cursor"]
+        if ndjson:
+            params["format"] = "ndjson"
+        if name.endswith("_fields"):
+            params["fields"] = NARROW_FIELDS
+        return "GET", path, {"params": params}
+
+    def check(s, response, body):
+        if ndjson:
+            lines = body.splitlines()
+            end = json.loads(lines[-1]) if lines else {}
+            s["cursor"] = end.get("next_cursor")
+            return max(0, len(lines) - 1)
+        data = json.loads(body)
+        s["cursor"] = data.get("next_cursor")
+        pages = data["tables"].values() if "tables" in data else [data]
+        return sum(len(p.get("upserts", ())) + len(p.get("deletes", ())) for p in pages)
+
+    return make, check
+
+async def run_sync(client: httpx.AsyncClient, name: str, fake) -> dict:
+    """One timed call; records = buildings pushed, or Airtable records pulled."""
+    before = dict(fake.requests)
+    start = time.perf_counter()
+    if name == "sync_buildings_to_airtable":
+        response = await client.post("/sync_buildings_to_airtable/", timeout=None)
+        body = response.json() if response.status_code == 200 else {}
+        records = body.get("updated", 0) + body.get("created", 0) + body.get("failed", 0)
+    else:
+        records = len(fake.tables.get("airtable_Building", {}))
+        response = await client.get("/fetch_buildings_from_airtable/", timeout=None)
+    seconds = time.perf_counter() - start
+    calls = {k: fake.requests.get(k, 0) - before.get(k, 0) for k in fake.requests}
+    writes = calls.get("PATCH", 0) + calls.get("POST", 0)
+    out = {
+        "status": response.status_code,
+        "records": records,
+        "seconds": round(seconds, 4),
+        "records_per_sec": round(records / seconds, 2) if seconds else 0.0,
+        "airtable_requests": calls,
+    }
+    if name == "sync_buildings_to_airtable":
+        # 10-record batches at 5 req/s: the push cannot beat this however fast the code is
+        out["rate_floor_seconds"] = round(max(0, writes - 5) / 5.0, 2)
+    return out
+
+
+# ---- results ----
+
+def compare(old: dict, new: dict, threshold: float = None) -> list:
+    """Prints rps / p95 deltas per scenario; returns the scenarios that regressed past threshold %."""
+    regressions = []
+    print(f"\n{'scenario':<28}{'rps old':>10}{'rps new':>10}{'Δ%':>8}{'p95 old':>10}{'p95 new':>10}{'Δ%':>8}")
+    for name, cur in new.get("scenarios", {}).items():
+        prev = old.get("scenarios", {}).get(name)
+        if not prev:
+            continue
+        d_rps = (cur["rps"] - prev["rps"]) / prev["rps"] * 100 if prev["rps"] else 0.0
+        p_old, p_new = prev["latency_ms"]["p95"], cur["latency_ms"]["p95"]
+        d_p95 = (p_new - p_old) / p_old * 100 if p_old else 0.0
+        flag = ""
+        if threshold is not None and (d_rps < -threshold or d_p95 > threshold):
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{prev['rps']:>10.1f}{cur['rps']:>10.1f}{d_rps:>+8.1f}{p_old:>10.2f}{p_new:>10.2f}{d_p95:>+8.1f}{flag}")
+    return regressions
+
+def print_table(result: dict):
+    print(f"\n{'scenario':<28}{'reqs':>7}{'err':>5}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, s in result["scenarios"].items():
+        lat = s["latency_ms"]
+        print(f"{name:<28}{s['requests']:>7}{s['errors']:>5}{s['rps']:>10.1f}{lat['p50']:>9.2f}{lat['p95']:>9.2f}{lat['p99']:>9.2f}")
+    for name, s in result.get("sync", {}).items():
+        floor = f", floor {s['rate_floor_seconds']}s" if "rate_floor_seconds" in s else ""
+        print(f"{name:<28} {s['status']}  {s['records']} records in {s['seconds']}s ({s['records_per_sec']}/s{floor})")
+
+
+# ---- main ----
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    ap.add_argument("--buildings", default="1k", help="portfolio size: 1k .. 1m (default 1k)")
+    ap.add_argument("--requests", type=int, default=500, help="requests per scenario (default 500)")
+    ap.add_argument("--concurrency", type=int, default=8, help="closed-loop workers per scenario (default 8)")
+    ap.add_argument("--scenarios", default="all", help="comma-separated names, or all / writes / feeds / sync")
+    ap.add_argument("--skip-sync", action="store_true", help="skip the Airtable sync routines (rate-limited: ~N/50 s)")
+    ap.add_argument("--airtable-records", default=None, help="records in the fake airtable_Building (default: min(buildings, 5k))")
+    ap.add_argument("--airtable-rps", type=float, default=0, help="rate-limit the fake Airtable base (0 = off)")
+    ap.add_argument("--airtable-latency-ms", type=float, default=0, help="added latency per fake Airtable call")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--db-path", default=None, help="SQLite file to use (default: a temp file)")
+    ap.add_argument("--keep-db", action="store_true", help="keep the SQLite file afterwards")
+    ap.add_argument("--out", default=None, help="results JSON path (default benchmarks/results/<timestamp>-<commit>.json)")
+    ap.add_argument("--compare", default=None, help="previous results JSON to diff against")
+    ap.add_argument("--fail-on-regression", type=float, default=None, metavar="PCT",
+                    help="with --compare: exit 1 if any rps drops or p95 rises by more than PCT%%")
+    return ap.parse_args(argv)
+
+def pick_scenarios(spec: str, skip_sync: bool) -> list:
+    groups = {"writes": WRITE_SCENARIOS, "feeds": FEED_SCENARIOS, "sync": SYNC_SCENARIOS}
+    groups["all"] = WRITE_SCENARIOS + FEED_SCENARIOS + SYNC_SCENARIOS
+    names = []
+    for part in (x.strip() for x in spec.split(",") if x.strip()):
+        for name in groups.get(part, [part]):
+            if name not in groups["all"]:
+                raise SystemExit(f"unknown scenario: {name}")
+            if name not in names and not (skip_sync and name in SYNC_SCENARIOS):
+                names.append(name)
+    return names
+
+async def run_scenarios(main, fake, p: Portfolio, names: list, args) -> tuple:
+    scenarios, sync = {}, {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name in names:
+            if name in SYNC_SCENARIOS:
+                print(f"  {name} ...", flush=True)
+                sync[name] = await run_sync(client, name, fake)
+                continue
+            make, check = feed_scenario(name) if name in FEED_SCENARIOS else write_scenario(name, p)
+            print(f"  {name} ...", flush=True)
+            scenarios[name] = await drive(client, make, args.requests, args.concurrency, check)
+    return scenarios, sync
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    buildings = portfolio.parse_size(args.buildings)
+    names = pick_scenarios(args.scenarios, args.skip_sync)
+    at_records = portfolio.parse_size(args.airtable_records) if args.airtable_records else min(buildings, 5000)
+
+    tmp_dir = None
+    db_path = args.db_path
+    if not db_path:
+        tmp_dir = tempfile.mkdtemp(prefix="wbis-bench-")
+        db_path = os.path.join(tmp_dir, "standin.db")
+    fake = fake_airtable.FakeAirtable(rate_per_sec=args.airtable_rps, latency_ms=args.airtable_latency_ms)
+    try:
+        print(f"seeding {buildings} buildings into {db_path} ...", flush=True)
+        start = time.perf_counter()
+        standin_db.create_database(db_path)
+        rows = portfolio.seed_database(db_path, buildings, seed=args.seed)
+        seed_seconds = time.perf_counter() - start
+        fake.seed("airtable_Building", portfolio.airtable_building_records(buildings, at_records, seed=args.seed))
+        fake.start()
+
+        app_main = load_app(db_path, fake.url)
+        p = Portfolio(rows, args.seed)
+        scenarios, sync = asyncio.run(run_scenarios(app_main, fake, p, names, args))
+    finally:
+        fake.stop()
+        if not args.keep_db:
+            for suffix in ("", "-wal", "-shm"):
+                with contextlib.suppress(OSError):
+                    os.remove(db_path + suffix)
+            if tmp_dir:
+                with contextlib.suppress(OSError):
+                    os.rmdir(tmp_dir)
+
+    git = git_info()
+    result = {
+        "suite": "wbis-api-bench",
+        "version": SUITE_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "buildings": buildings, "requests": args.requests, "concurrency": args.concurrency,
+            "airtable_records": at_records, "airtable_rps": args.airtable_rps,
+            "airtable_latency_ms": args.airtable_latency_ms, "seed": args.seed,
+        },
+        "setup": {"seed_seconds": round(seed_seconds, 3), "rows": rows},
+        "scenarios": scenarios,
+        "sync": sync,
+    }
+    print_table(result)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{git['commit'] or 'nogit'}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresults -> {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        if old.get("params", {}).get("buildings") != buildings:
+            print(f"note: comparing against a {old.get('params', {}).get('buildings')}-building run")
+        regressions = compare(old, result, args.fail_on_regression)
+        if regressions:
+            print(f"\nregressed past {args.fail_on_regression}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+﻿"""
+SQLite stand-in for the wbis_core SQL Server database, for offline benchmarks.
+
+  - derive_schema() turns DATABASESCRIPT.sql into SQLite DDL, plus the columns the
+    API relies on that the script predates (SCHEMA_DRIFT)
+  - this module doubles as a `pyodbc` replacement (install() puts it in sys.modules):
+    connect() returns connections that translate the T-SQL subset main.py sends
+    (TOP, OUTPUT ... INTO, #temp / @table variables, SYSUTCDATETIME, CONVERT(..., 126), ...)
+    and keep SET NOCOUNT as session state, so rowcount reads -1 after a batch leaks it
+
+Not a SQL Server emulator: CHECK/FK constraints and triggers other than updated_at are
+not reproduced, collation is NOCASE, and OUTPUT DELETED.* returns post-update values.
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Optional
+
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "..", "DATABASESCRIPT.sql")
+
+# SQLite text for "now" with the same 6-digit fraction Python's isoformat() gives
+NOW_SQL = "(strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000')"
+
+# Columns/renames the live database has that DATABASESCRIPT.sql (9/21/2025) does not.
+SCHEMA_DRIFT = {
+    "Building": {"add": ["is_deleted", "deleted_at", "updated_at"]},
+    "Entity": {"add": ["is_deleted", "deleted_at", "updated_at"]},
+    "ClientContact": {
+        "rename": {
+            "ClientContact_Id": "client_contact_id",
+            "First Name": "first_name",
+            "Last Name": "last_name",
+            "Mailing Address": "mailing_address",
+            "Physical Address": "physical_address",
+            "Phone": "phone",
+            "Email": "email",
+        },
+        "add": ["is_deleted", "deleted_at", "updated_at"],
+    },
+    "Building_Contact": {"add": ["updated_at"]},
+}
+DRIFT_COLUMNS = {
+    "is_deleted": "[is_deleted] BIT NOT NULL DEFAULT 0",
+    "deleted_at": "[deleted_at] DATETIME2 NULL",
+    "updated_at": f"[updated_at] DATETIME2 NOT NULL DEFAULT {NOW_SQL}",
+}
+
+_TYPES = {
+    "int": "INTEGER", "smallint": "INTEGER", "tinyint": "INTEGER", "bigint": "INTEGER",
+    "bit": "BIT", "decimal": "NUMERIC", "numeric": "NUMERIC", "money": "NUMERIC",
+    "date": "DATE", "datetime": "DATETIME2", "datetime2": "DATETIME2",
+    "nvarchar": "TEXT COLLATE NOCASE", "varchar": "TEXT COLLATE NOCASE",
+    "nchar": "TEXT COLLATE NOCASE", "char": "TEXT COLLATE NOCASE",
+}
+
+
+# ---- schema ----
+
+def read_script(path: str = SCRIPT_PATH) -> str:
+    raw = open(path, "rb").read()
+    enc = "utf-16" if raw[:2] in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    return raw.decode(enc).replace("\r\n", "\n")
+
+def _cols(text: str) -> List[str]:
+    return re.findall(r"\[([^\]]+)\]", text)
+
+def derive_schema(script: Optional[str] = None) -> List[str]:
+    """SQLite DDL for every table in DATABASESCRIPT.sql, with SCHEMA_DRIFT applied."""
+    script = script if script is not None else read_script()
+    defaults = {}
+    for table, value, column in re.findall(
+        r"ALTER TABLE \[dbo\]\.\[(\w+)\] ADD\s+CONSTRAINT \[\w+\]\s+DEFAULT \((.+?)\) FOR \[([^\]]+)\]", script
+    ):
+        value = NOW_SQL if "sysutcdatetime" in value.lower() else value
+        defaults[(table, column)] = value
+
+    ddl = []
+    for table, body in re.findall(r"CREATE TABLE \[dbo\]\.\[(\w+)\]\((.*?)\n\) ON \[PRIMARY\]", script, re.S):
+        drift = SCHEMA_DRIFT.get(table, {})
+        rename = drift.get("rename", {})
+        pk = [rename.get(c, c) for c in _cols(re.search(r"PRIMARY KEY CLUSTERED\s*\((.*?)\)", body, re.S).group(1))]
+        uniques = [
+            [rename.get(c, c) for c in _cols(u)]
+            for u in re.findall(r"UNIQUE NONCLUSTERED\s*\((.*?)\)", body, re.S)
+        ]
+        lines = []
+        for name, sql_type, identity, null in re.findall(
+            r"^\t\[([^\]]+)\] \[(\w+)\](?:\([^)]*\))?( IDENTITY\(1,1\))? (NOT NULL|NULL)", body, re.M
+        ):
+            col = rename.get(name, name)
+            if identity and pk == [col]:
+                lines.append(f"[{col}] INTEGER PRIMARY KEY")
+                continue
+            line = f"[{col}] {_TYPES.get(sql_type.lower(), 'TEXT')} {null}"
+            if (table, name) in defaults:
+                line += f" DEFAULT {defaults[(table, name)]}"
+            lines.append(line)
+        lines += [DRIFT_COLUMNS[c] for c in drift.get("add", [])]
+        if len(pk) > 1 or not any(l.endswith("PRIMARY KEY") for l in lines):
+            lines.append("PRIMARY KEY (" + ", ".join(f"[{c}]" for c in pk) + ")")
+        lines += ["UNIQUE (" + ", ".join(f"[{c}]" for c in u) + ")" for u in uniques]
+        ddl.append(f"CREATE TABLE [{table}] (\n  " + ",\n  ".join(lines) + "\n)")
+
+        if "updated_at" in drift.get("add", []):
+            # the */changes feeds need updated_at bumped on every write, as the live triggers do
+            ddl.append(f"CREATE INDEX [IX_{table}_updated_at] ON [{table}] ([updated_at], [{pk[0]}])")
+            ddl.append(
+                f"CREATE TRIGGER [TR_{table}_updated_at] AFTER UPDATE ON [{table}] "
+                f"WHEN NEW.[updated_at] IS OLD.[updated_at] BEGIN "
+                f"UPDATE [{table}] SET [updated_at] = {NOW_SQL} WHERE [{pk[0]}] = NEW.[{pk[0]}]; END"
+            )
+    return ddl
+
+def create_database(path: str, script: Optional[str] = None):
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        for stmt in derive_schema(script):
+            db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ---- T-SQL -> SQLite ----
+
+class Statement:
+    __slots__ = ("sql", "nparams", "move_to_end", "into", "nocount")
+
+    def __init__(self, sql: str, nparams: int, move_to_end: Optional[int] = None, into: Optional[str] = None,
+                 nocount: Optional[bool] = None):
+        self.sql = sql
+        self.nparams = nparams          # '?' placeholders in the original T-SQL
+        self.move_to_end = move_to_end  # TOP (?) param index that becomes LIMIT ?
+        self.into = into                # OUTPUT ... INTO target table
+        self.nocount = nocount          # SET NOCOUNT ON/OFF
+
+_TOP = re.compile(r"\bTOP\s*(?:\(\s*(\?|\d+)\s*\)|(\d+))", re.I)
+_OUTPUT = re.compile(
+    r"\bOUTPUT\s+(.+?)(?:\s+INTO\s+([#@]\w+))?\s+(?=VALUES\b|SELECT\b|WHERE\b|FROM\b|DEFAULT\b)", re.I | re.S
+)
+_CONVERT_126 = re.compile(r"CONVERT\(\s*N?VARCHAR\((\d+)\)\s*,\s*((?:[^,()]|\([^()]*\))+?)\s*,\s*126\s*\)", re.I)
+_CAST_DT = re.compile(r"CAST\(\s*(\?|[^()]+?)\s+AS\s+DATETIME2?(?:\(\d\))?\s*\)", re.I)
+_DROP_TEMP = re.compile(r"IF\s+OBJECT_ID\('tempdb\.\.#(\w+)'\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+#\w+", re.I)
+_DECLARE_TABLE = re.compile(r"^DECLARE\s+@(\w+)\s+TABLE\s*(\(.*\))\s*$", re.I | re.S)
+_NOCOUNT = re.compile(r"^SET\s+NOCOUNT\s+(ON|OFF)$", re.I)
+_NOOP = re.compile(r"^(SET\s+XACT_ABORT\s+\w+|SET\s+TRANSACTION\s+ISOLATION\s+LEVEL\s+.+)$", re.I | re.S)
+_FUNCS = [
+    (re.compile(r"\b(SYSUTCDATETIME|SYSDATETIME|GETUTCDATE|GETDATE)\(\)", re.I), "sysutcdatetime()"),
+    (re.compile(r"\bISNULL\(", re.I), "IFNULL("),
+    (re.compile(r"\bLEN\(", re.I), "LENGTH("),
+    (re.compile(r"\bCOUNT_BIG\(", re.I), "COUNT("),
+    (re.compile(r"\bDATEDIFF_BIG\(\s*MICROSECOND\s*,\s*'1970-01-01'\s*,\s*([^()]+?)\s*\)", re.I),
+     r"(CAST(strftime('%s', substr(\1, 1, 19)) AS INTEGER) * 1000000 + CAST(substr(\1 || '.000000', 21, 6) AS INTEGER))"),
+    (re.compile(r"\bWITH\s*\(\s*(NOLOCK|UPDLOCK|HOLDLOCK|ROWLOCK|READPAST)(\s*,\s*\w+)*\s*\)", re.I), ""),
+    (re.compile(r"\[dbo\]\.|\bdbo\.", re.I), ""),
+    (re.compile(r"\bN'"), "'"),
+]
+
+def _split(sql: str) -> List[str]:
+    sql = re.sub(r"--[^\n]*", "", sql)
+    return [s.strip() for s in re.split(r";(?=(?:[^']*'[^']*')*[^']*$)", sql) if s.strip()]
+
+def _names(sql: str) -> str:
+    sql = re.sub(r"\bCREATE\s+TABLE\s+#(\w+)", r"CREATE TEMP TABLE tmp_\1", sql, flags=re.I)
+    sql = re.sub(r"#(\w+)", r"tmp_\1", sql)
+    return re.sub(r"@(\w+)", r"tv_\1", sql)
+
+@lru_cache(maxsize=512)
+def translate(sql: str) -> tuple:
+    """T-SQL batch -> tuple of Statements for sqlite3."""
+    out = []
+    for stmt in _split(sql):
+        nparams = stmt.count("?")
+        m = _NOCOUNT.match(stmt)
+        if m:
+            out.append(Statement("", nparams, nocount=m.group(1).upper() == "ON"))
+            continue
+        if _NOOP.match(stmt):
+            out.append(Statement("", nparams))
+            continue
+        m = _DECLARE_TABLE.match(stmt)
+        if m:
+            out.append(Statement(f"DROP TABLE IF EXISTS temp.tv_{m.group(1)}", 0))
+            out.append(Statement(f"CREATE TEMP TABLE tv_{m.group(1)} {m.group(2)}", 0))
+            continue
+        stmt = _DROP_TEMP.sub(r"DROP TABLE IF EXISTS temp.tmp_\1", stmt)
+        for pattern, repl in _FUNCS:
+            stmt = pattern.sub(repl, stmt)
+        stmt = _CONVERT_126.sub(r"substr(\2, 1, \1)", stmt)
+        stmt = _CAST_DT.sub(r"\1", stmt)
+
+        move_to_end, limit = None, None
+        top = _TOP.search(stmt)
+        if top:
+            value = top.group(1) or top.group(2)
+            if value == "?":
+                move_to_end = stmt[:top.start()].count("?")
+            limit = value
+            stmt = stmt[:top.start()] + stmt[top.end():]
+
+        into, returning = None, None
+        out_m = _OUTPUT.search(stmt)
+        if out_m:
+            returning = re.sub(r"\b(INSERTED|DELETED)\.", "", out_m.group(1), flags=re.I)
+            into = out_m.group(2)
+            stmt = stmt[:out_m.start()] + stmt[out_m.end():]
+
+        stmt = _names(stmt)
+        if limit is not None:
+            stmt += f" LIMIT {limit}"
+        if returning is not None:
+            stmt += f" RETURNING {returning}"
+        out.append(Statement(stmt, nparams, move_to_end, _names(into) if into else None))
+    return tuple(out)
+
+
+# ---- pyodbc-compatible surface ----
+
+apilevel = "2.0"
+threadsafety = 1
+paramstyle = "qmark"
+version = "0.0-standin"
+
+class Error(Exception):
+    pass
+
+class DatabaseError(Error):
+    pass
+
+class IntegrityError(DatabaseError):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
+
+def _wrap(e: sqlite3.Error) -> Error:
+    msg = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        code = 2627 if "UNIQUE" in msg else 547
+        return IntegrityError("23000", f"[23000] [standin] (SQL Server error {code}) {msg}")
+    if isinstance(e, sqlite3.OperationalError):
+        return OperationalError("HY000", f"[HY000] [standin] {msg}")
+    return ProgrammingError("42000", f"[42000] [standin] {msg}")
+
+def _param(v):
+    if isinstance(v, datetime):
+        if v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v.isoformat(timespec="microseconds")
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    if isinstance(v, bool):
+        return int(v)
+    return v
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+
+sqlite3.register_converter("DATETIME2", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+
+
+class Cursor:
+    def __init__(self, conn: "Connection"):
+        self._conn = conn
+        self._cur = None
+        self._rows = None
+        self._sets = []   # further result sets of the batch, for nextset()
+        self.description = None
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql: str, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        params = [_param(p) for p in params]
+        stmts = translate(sql)
+        self._cur, self._rows, self.description, self.rowcount = None, None, None, -1
+        sets = []
+        db = self._conn._db
+        offset = 0
+        nocount = self._conn.nocount
+        try:
+            for i, st in enumerate(stmts):
+                args = params[offset:offset + st.nparams]
+                offset += st.nparams
+                if st.nocount is not None:
+                    nocount = st.nocount
+                if not st.sql:
+                    continue
+                if st.move_to_end is not None:
+                    args.append(args.pop(st.move_to_end))
+                cur = db.execute(st.sql, args)
+                if st.into:
+                    rows = cur.fetchall()
+                    if rows:
+                        marks = ", ".join("?" * len(rows[0]))
+                        db.executemany(f"INSERT INTO {st.into} VALUES ({marks})", [[_param(v) for v in r] for r in rows])
+                    self.rowcount = len(rows)
+                elif cur.description is not None:
+                    # only the batch's last statement can stay a live sqlite cursor
+                    if i == len(stmts) - 1:
+                        sets.append((cur.description, cur, None))
+                    else:
+                        sets.append((cur.description, None, cur.fetchall()))
+                    self.rowcount = -1 if cur.rowcount < 0 else cur.rowcount
+                else:
+                    self.rowcount = cur.rowcount
+                if nocount:
+                    self.rowcount = -1
+        except sqlite3.Error as e:
+            raise _wrap(e) from e
+        finally:
+            # like SQL Server: a SET in a parameterless batch stays on the session, a parameterized
+            # batch runs through sp_executesql and its SETs end with it
+            if not params:
+                self._conn.nocount = nocount
+        self._sets = sets
+        self.nextset()
+        return self
+
+    def executemany(self, sql: str, seq):
+        (st,) = [s for s in translate(sql) if s.sql]
+        db = self._conn._db
+        rows = [[_param(p) for p in row] for row in seq]
+        try:
+            if st.into:
+                # sqlite has no executemany with RETURNING: one statement per row, OUTPUT rows kept
+                count = 0
+                for row in rows:
+                    out = db.execute(st.sql, row).fetchall()
+                    count += len(out)
+                    if out:
+                        marks = ", ".join("?" * len(out[0]))
+                        db.executemany(f"INSERT INTO {st.into} VALUES ({marks})", [[_param(v) for v in r] for r in out])
+            else:
+                count = db.executemany(st.sql, rows).rowcount
+            self.rowcount = -1 if self._conn.nocount else count
+        except sqlite3.Error as e:
+            raise _wrap(e) from e
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        return self._cur.fetchone() if self._cur else None
+
+    def fetchmany(self, size: int = 1):
+        if self._rows is not None:
+            out, self._rows = self._rows[:size], self._rows[size:]
+            return out
+        return self._cur.fetchmany(size) if self._cur else []
+
+    def fetchall(self):
+        if self._rows is not None:
+            out, self._rows = self._rows, []
+            return out
+        return self._cur.fetchall() if self._cur else []
+
+    def nextset(self):
+        if not self._sets:
+            self._cur, self._rows = None, None
+            return False
+        self.description, self._cur, self._rows = self._sets.pop(0)
+        return True
+
+    def close(self):
+        self._cur, self._rows, self._sets = None, None, []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class Connection:
+    def __init__(self, path: str, timeout: float = 30.0):
+        self._db = sqlite3.connect(
+            path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        self._db.create_function("sysutcdatetime", 0, _utcnow)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self.autocommit = False
+        self.nocount = False  # session SET NOCOUNT; survives commit/rollback, as on SQL Server
+
+    def cursor(self) -> Cursor:
+        return Cursor(self)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+_default_path = {"path": None}
+_lock = threading.Lock()
+
+def connect(conn_str: str = "", autocommit: bool = False, timeout: float = 30.0, **kwargs) -> Connection:
+    """Accepts an ODBC-style string; DATABASE=<sqlite file> picks the file."""
+    m = re.search(r"(?:^|;)\s*DATABASE\s*=\s*([^;]+)", conn_str or "", re.I)
+    path = m.group(1).strip() if m else _default_path["path"]
+    if not path:
+        raise OperationalError("08001", "[08001] [standin] no DATABASE= in connection string")
+    conn = Connection(path, timeout=timeout or 30.0)
+    conn.autocommit = autocommit
+    return conn
+
+def install(path: Optional[str] = None):
+    """Register this module as `pyodbc` (before main is imported)."""
+    with _lock:
+        _default_path["path"] = path
+        sys.modules["pyodbc"] = sys.modules[__name__]
@@ -0,0 +1,73 @@
+﻿import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+# Concurrency model:
+#   - plain `def` routes run in Starlette's worker threadpool, never on the event loop
+#   - hot `async def` routes (ingest, */changes, Airtable sync) keep the loop free by
+#     awaiting blocking pyodbc/ORM work through a BlockingExecutor, and talk to
+#     Airtable with httpx.AsyncClient
+#   - the executor is sized to the DB pool, so extra requests queue here instead of
+#     holding a thread while they wait for a connection
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool for blocking calls awaited from async handlers.
+
+      await executor.run(fn, *args, **kwargs)
+
+    Context variables of the caller are visible inside fn.
+    """
+
+    def __init__(self, max_workers: int, name: str = "blocking"):
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        self.max_workers = max_workers
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "running": 0}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _call(self, fn: Callable, args, kwargs):
+        with self._lock:
+            self._stats["running"] += 1
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["completed" if ok else "failed"] += 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        with self._lock:
+            self._stats["submitted"] += 1
+        return await loop.run_in_executor(self._pool(), partial(ctx.run, self._call, fn, args, kwargs))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        done = out["completed"] + out["failed"]
+        out.update(max_workers=self.max_workers, queued=max(0, out["submitted"] - done - out["running"]))
+        return out
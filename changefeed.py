@@ -0,0 +1,113 @@
+﻿import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Change feeds page on (updated_at, id). The timestamp is carried as the exact
+# DATETIME2 string from SQL Server (CONVERT(..., 126)) so rows that share a
+# timestamp, or differ only below microsecond precision, are never skipped or repeated.
+
+CURSOR_TS_SQL = "CONVERT(VARCHAR(27), {col}, 126)"
+
+
+class CursorError(ValueError):
+    """Raised for a cursor token that was not produced by encode_cursor."""
+
+
+def encode_cursor(ts: str, key: int) -> str:
+    raw = json.dumps({"t": ts, "k": int(key)}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_cursor(token: str) -> Tuple[str, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts, key = data["t"], data["k"]
+        if not isinstance(ts, str) or not isinstance(key, int):
+            raise ValueError
+        datetime.fromisoformat(ts[:26])  # sanity check; SQL gets the full string
+        return ts, key
+    except Exception:
+        raise CursorError("Invalid 'cursor' (pass next_cursor from a previous response unchanged)")
+
+def encode_cursors(cursors: dict) -> str:
+    """Combined token for the multi-table feed: {table: encode_cursor() token}."""
+    raw = json.dumps(cursors, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_cursors(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursors = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(cursors, dict) or not cursors or not all(isinstance(v, str) for v in cursors.values()):
+            raise ValueError
+    except Exception:
+        raise CursorError("Invalid 'cursor' (pass next_cursor from a previous response unchanged)")
+    for token in cursors.values():
+        decode_cursor(token)
+    return cursors
+
+def cursor_ts_column(ts_col: str) -> str:
+    return CURSOR_TS_SQL.format(col=ts_col)
+
+# Order-independent checksum over (updated_at, id) that Python can reproduce from cursor
+# values, so an in-memory copy of a range can be checked against one aggregate query.
+CHECKSUM_MOD = 1_000_000_007
+CHECKSUM_SQL = "SUM(DATEDIFF_BIG(MICROSECOND, '1970-01-01', {ts}) % " + str(CHECKSUM_MOD) + " + CAST({key} AS BIGINT))"
+_EPOCH = datetime(1970, 1, 1)
+
+def checksum_column(ts_col: str, id_col: str) -> str:
+    return CHECKSUM_SQL.format(ts=ts_col, key=id_col)
+
+def row_checksum(ts: str, key: int) -> int:
+    """One row's term of checksum_column(); ts is the cursor string (7 fractional digits are floored)."""
+    delta = datetime.fromisoformat(ts[:26]) - _EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return micros % CHECKSUM_MOD + int(key)
+
+def lower_bound(ts_col: str, id_col: str, since_dt: datetime, cursor: Optional[str]) -> Tuple[str, list]:
+    """
+    WHERE fragment + params for the start of a page.
+    Without a cursor: ts_col > since. With a cursor: strictly after (ts, id).
+    """
+    if not cursor:
+        return f"{ts_col} > ?", [since_dt]
+    ts, key = decode_cursor(cursor)
+    sql = (
+        f"({ts_col} > CAST(? AS DATETIME2(7)) "
+        f"OR ({ts_col} = CAST(? AS DATETIME2(7)) AND {id_col} > ?))"
+    )
+    return sql, [ts, ts, key]
+
+def top_clause(limit: Optional[int]) -> Tuple[str, list]:
+    # fetch one extra row to learn whether another page exists
+    if limit is None:
+        return "", []
+    return "TOP (?)", [limit + 1]
+
+def split_page(rows: list, limit: Optional[int]) -> Tuple[list, bool]:
+    if limit is None or len(rows) <= limit:
+        return rows, False
+    return rows[:limit], True
+
+# Conditional requests: a feed page (or record) is tagged with a weak ETag over cheap
+# probe values -- row count and newest updated_at in the page's range -- so pollers that
+# send If-None-Match get a 304 without the feed query ever running.
+
+def etag(*parts) -> str:
+    raw = json.dumps(parts, default=str, separators=(",", ":")).encode("utf-8")
+    return 'W/"' + hashlib.blake2b(raw, digest_size=12).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """If-None-Match semantics: weak comparison, comma-separated list or '*'."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = tag[2:] if tag.startswith("W/") else tag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == bare:
+            return True
+    return False
@@ -0,0 +1,76 @@
+﻿import json
+import time
+from decimal import Decimal
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from metrics import add_phase
+
+try:
+    import orjson
+except ImportError:  # stdlib json below gives the same output, only slower
+    orjson = None
+
+# JSON in and out of the API.
+#   - CodecRoute parses request bodies with loads() (orjson when installed)
+#   - FastJSONResponse renders with dumps(); it is the app's default response class
+#   - hot handlers (*/changes, batch ingest) return FastJSONResponse(payload) themselves,
+#     which skips FastAPI's jsonable_encoder walk over every row: datetimes, dates and
+#     Decimals are written by the serializer directly
+
+
+def default(v):
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=default)
+
+    def dumps_line(obj) -> bytes:
+        """dumps() + newline, for NDJSON."""
+        return orjson.dumps(obj, default=default, option=orjson.OPT_APPEND_NEWLINE)
+
+    loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+else:
+    def dumps(obj) -> bytes:
+        # same settings as Starlette's JSONResponse
+        return json.dumps(obj, default=default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_line(obj) -> bytes:
+        """dumps() + newline, for NDJSON."""
+        return dumps(obj) + b"\n"
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = dumps(content)
+        add_phase("serialize", time.perf_counter() - started)
+        return body
+
+
+class CodecRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class CodecRoute(APIRoute):
+    """APIRoute whose JSON bodies (`payload: dict = Body(...)`, pydantic models) go through loads()."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await handler(CodecRequest(request.scope, request.receive))
+
+        return route_handler
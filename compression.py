@@ -0,0 +1,243 @@
+﻿import asyncio
+import threading
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Response compression negotiated from Accept-Encoding: zstd, br (when those packages are
+# installed) or gzip. Bodies under minimum_size go out as-is; streaming bodies (NDJSON feeds)
+# are buffered up to minimum_size, then compressed chunk by chunk with a flush per chunk so
+# clients still see rows as they are produced. Large chunks are compressed off the event loop.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+OFFLOAD_BYTES = 64 * 1024  # chunks at least this big are compressed in a worker thread
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        self._c = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# server preference order, best ratio per CPU first; level per coding
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = (_Zstd, 3)
+if brotli is not None:
+    ENCODERS["br"] = (_Brotli, 4)
+ENCODERS["gzip"] = (_Gzip, 6)
+
+
+def negotiate(accept_encoding: Optional[str], available=ENCODERS) -> Optional[str]:
+    """Best coding the client accepts (highest q, ties to server preference), or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"compressed": 0, "streamed": 0, "skipped_small": 0, "bytes_in": 0, "bytes_out": 0}
+        self._codings = {}
+
+    def add(self, coding: Optional[str], bytes_in: int, bytes_out: int, streamed: bool = False):
+        with self._lock:
+            s = self._stats
+            if coding is None:
+                s["skipped_small"] += 1
+                return
+            s["compressed"] += 1
+            s["streamed"] += streamed
+            s["bytes_in"] += bytes_in
+            s["bytes_out"] += bytes_out
+            self._codings[coding] = self._codings.get(coding, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["codings"] = dict(self._codings)
+        out["bytes_saved"] = out["bytes_in"] - out["bytes_out"]
+        out["ratio"] = round(out["bytes_out"] / out["bytes_in"], 4) if out["bytes_in"] else None
+        out["available"] = list(ENCODERS)
+        return out
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware:
+      app.add_middleware(CompressionMiddleware, minimum_size=1024, stats=CompressionStats())
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, stats: Optional[CompressionStats] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stats = stats or CompressionStats()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            return await self.app(scope, receive, send)
+        accept = None
+        for name, value in scope.get("headers") or ():
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        await _Responder(self, negotiate(accept), send).run(self.app, scope, receive)
+
+
+def _vary_headers(headers) -> list:
+    """headers with Accept-Encoding merged into Vary; any compressible response varies on it."""
+    out = [(k, v) for k, v in headers or () if k.lower() != b"vary"]
+    vary = [v.decode("latin-1") for k, v in headers or () if k.lower() == b"vary"]
+    if not any(p.strip().lower() in ("accept-encoding", "*") for v in vary for p in v.split(",")):
+        vary.append("Accept-Encoding")
+    out.append((b"vary", ", ".join(vary).encode("latin-1")))
+    return out
+
+
+class _Responder:
+    def __init__(self, mw: CompressionMiddleware, coding: Optional[str], send):
+        self.mw = mw
+        self.coding = coding
+        self.send = send
+        self.start = None
+        self.passthrough = False
+        self.buffer = []
+        self.buffered = 0
+        self.encoder = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def run(self, app, scope, receive):
+        await app(scope, receive, self.wrapped_send)
+
+    async def wrapped_send(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            headers = {k.lower(): v for k, v in message.get("headers") or ()}
+            ctype = headers.get(b"content-type", b"").decode("latin-1")
+            self.passthrough = (
+                message["status"] < 200 or message["status"] in (204, 304)
+                or b"content-encoding" in headers
+                or not ctype.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            elif self.coding is None:
+                # identity for this client, but others would get a compressed body
+                self.passthrough = True
+                await self.send({**message, "headers": _vary_headers(message.get("headers"))})
+            return
+        if kind != "http.response.body" or self.passthrough:
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.encoder is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if more and self.buffered < self.mw.minimum_size:
+                return
+            body = b"".join(self.buffer)
+            self.buffer = []
+            if not more and len(body) < self.mw.minimum_size:
+                self.mw.stats.add(None, 0, 0)
+                await self.send({**self.start, "headers": _vary_headers(self.start.get("headers"))})
+                return await self.send({"type": "http.response.body", "body": body})
+            factory, level = ENCODERS[self.coding]
+            self.encoder = factory(level)
+            await self._send_start(None if more else body)
+            if not more:
+                return
+        out = await self._compress(body, more)
+        self.bytes_in += len(body)
+        self.bytes_out += len(out)
+        if not more:
+            self.mw.stats.add(self.coding, self.bytes_in, self.bytes_out, streamed=True)
+        await self.send({"type": "http.response.body", "body": out, "more_body": more})
+
+    async def _compress(self, body: bytes, more: bool) -> bytes:
+        enc = self.encoder
+        work = (lambda: enc.compress(body) + enc.flush()) if more else (lambda: enc.compress(body) + enc.finish())
+        if len(body) >= OFFLOAD_BYTES:
+            return await asyncio.to_thread(work)
+        return work()
+
+    async def _send_start(self, whole: Optional[bytes]):
+        """Rewrites the headers; whole is the complete body when it arrived in one message."""
+        headers = [(k, v) for k, v in _vary_headers(self.start.get("headers")) if k.lower() != b"content-length"]
+        headers.append((b"content-encoding", self.coding.encode("latin-1")))
+        if whole is None:
+            await self.send({**self.start, "headers": headers})
+            return
+        out = await self._compress(whole, more=False)
+        self.mw.stats.add(self.coding, len(whole), len(out))
+        headers.append((b"content-length", str(len(out)).encode("latin-1")))
+        await self.send({**self.start, "headers": headers})
+        await self.send({"type": "http.response.body", "body": out})
@@ -1,4 +1,4 @@
-﻿from fastapi import APIRouter, Depends, HTTPException
+﻿from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from main import sync_buildings_to_airtable
 from models.building_model import Building  # Specify the model path for clarity
@@ -42,5 +42,5 @@ def delete_building(building_id: int, db: Session = Depends(get_db)):
     return {"detail": "Building deleted"}
 
 @router.post("/sync_buildings")
-async def sync_buildings(db: Session = Depends(get_db)):
-    sync_buildings_to_airtable(db)
+async def sync_buildings(request: Request, db: Session = Depends(get_db)):
+    return await sync_buildings_to_airtable(request, db)
@@ -0,0 +1,312 @@
+﻿import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the wait timeout."""
+
+
+def _timed(timer, phase: str, method, args):
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = method(*args)
+        failed = False
+        return result
+    finally:
+        timer(phase, time.perf_counter() - started, failed)
+
+
+class TimedCursor:
+    """Cursor proxy reporting execute()/executemany() as "execute" and fetch*()/nextset() as "fetch"."""
+
+    __slots__ = ("_cur", "_timer")
+
+    def __init__(self, cur, timer: Callable[[str, float, bool], None]):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_timer", timer)
+
+    def execute(self, *args):
+        result = _timed(self._timer, "execute", self._cur.execute, args)
+        return self if result is self._cur else result  # keep cur.execute(...).fetchone() timed
+
+    def executemany(self, *args):
+        return _timed(self._timer, "execute", self._cur.executemany, args)
+
+    def fetchone(self):
+        return _timed(self._timer, "fetch", self._cur.fetchone, ())
+
+    def fetchmany(self, *args):
+        return _timed(self._timer, "fetch", self._cur.fetchmany, args)
+
+    def fetchall(self):
+        return _timed(self._timer, "fetch", self._cur.fetchall, ())
+
+    def nextset(self):
+        return _timed(self._timer, "fetch", self._cur.nextset, ())
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):  # cur.fast_executemany = True
+        setattr(self._cur, name, value)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cur.close()
+
+
+class PooledConnection:
+    """
+    Thin proxy around a DB-API connection handed out by ConnectionPool.
+    close() returns the connection to the pool instead of logging out,
+    so existing try/finally conn.close() handlers work unchanged.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._invalid = False
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self):
+        cur = self._raw.cursor()
+        timer = self._pool.timer
+        return cur if timer is None else TimedCursor(cur, timer)
+
+    def commit(self):
+        timer = self._pool.timer
+        if timer is None:
+            return self._raw.commit()
+        return _timed(timer, "commit", self._raw.commit, ())
+
+    def rollback(self):
+        return self._raw.rollback()
+
+    def invalidate(self):
+        """Mark the connection broken; it will be closed instead of reused."""
+        self._invalid = True
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._pool._checkin(raw, self._created_at, self._invalid)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections.
+
+      - size:         idle connections kept open between requests
+      - max_overflow: extra connections allowed under burst load (closed on return)
+      - timeout:      seconds to wait for a free connection before PoolTimeout
+      - recycle:      max lifetime in seconds; older connections are replaced
+      - ping_idle:    connections idle longer than this are health-checked on checkout
+      - timer:        called as timer(phase, seconds, failed) for connect() (including any
+                      wait), cursor execute/fetch and commit(); phase is "connect", "execute",
+                      "fetch" or "commit"
+    """
+
+    def __init__(
+        self,
+        creator: Callable[[], object],
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        recycle: float = 1800.0,
+        ping_idle: float = 5.0,
+        ping_sql: str = "SELECT 1",
+        timer: Optional[Callable[[str, float, bool], None]] = None,
+    ):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        if max_overflow < 0:
+            raise ValueError("max_overflow must be >= 0")
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_idle = ping_idle
+        self.ping_sql = ping_sql
+        self.timer = timer
+
+        self._idle = deque()          # (raw, created_at, returned_at)
+        self._open = 0                # idle + checked out
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "ping_failures": 0,
+            "recycled": 0,
+            "connect_errors": 0,
+        }
+
+    # ---- checkout / checkin ----
+
+    def connect(self) -> PooledConnection:
+        if self.timer is None:
+            return self._checkout()
+        return _timed(self.timer, "connect", self._checkout, ())
+
+    def _checkout(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                if self._idle:
+                    raw, created_at, returned_at = self._idle.pop()
+                elif self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    raw = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no DB connection available within {self.timeout:g}s "
+                            f"(size={self.size}, max_overflow={self.max_overflow})"
+                        )
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if raw is None:
+                return self._new_connection()
+
+            now = time.monotonic()
+            if self.recycle and now - created_at >= self.recycle:
+                self._discard(raw, reason="recycled", release=False)
+                return self._new_connection()
+            if self.ping_idle is not None and now - returned_at >= self.ping_idle and not self._ping(raw):
+                self._discard(raw, reason="ping_failures", release=False)
+                return self._new_connection()
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return PooledConnection(self, raw, created_at)
+
+    def _new_connection(self) -> PooledConnection:
+        # caller already reserved a slot in self._open
+        try:
+            raw = self._creator()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._stats["connect_errors"] += 1
+                self._cond.notify()
+            raise
+        created_at = time.monotonic()
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["checkouts"] += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _checkin(self, raw, created_at: float, invalid: bool):
+        if not invalid:
+            try:
+                raw.rollback()  # never hand the next request an open transaction
+            except Exception:
+                invalid = True
+
+        with self._cond:
+            self._stats["checkins"] += 1
+            keep = (
+                not invalid
+                and not self._closed
+                and len(self._idle) < self.size
+                and not (self.recycle and time.monotonic() - created_at >= self.recycle)
+            )
+            if keep:
+                self._idle.append((raw, created_at, time.monotonic()))
+                self._cond.notify()
+                return
+
+        self._discard(raw)
+
+    def _discard(self, raw, reason: Optional[str] = None, release: bool = True):
+        # release=False keeps the slot reserved for an immediate replacement
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+            if reason:
+                self._stats[reason] += 1
+            if release:
+                self._open -= 1
+                self._cond.notify()
+
+    def _ping(self, raw) -> bool:
+        try:
+            cur = raw.cursor()
+            try:
+                cur.execute(self.ping_sql)
+                cur.fetchall()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    # ---- management ----
+
+    def reopen(self):
+        """Accept checkouts again after dispose(), e.g. for the next application lifespan."""
+        with self._cond:
+            self._closed = False
+
+    def dispose(self):
+        """Close every idle connection; checked-out ones are closed on return."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = dict(self._stats)
+            out.update(
+                size=self.size,
+                max_overflow=self.max_overflow,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+                overflow=max(0, self._open - self.size),
+            )
+        return out
@@ -0,0 +1,415 @@
+﻿from datetime import date, datetime
+from functools import lru_cache
+from operator import itemgetter
+from typing import NamedTuple, Optional, Tuple
+from changefeed import checksum_column, cursor_ts_column
+
+# One declarative map per table: API key <-> SQL column <-> Airtable labels,
+# plus the value coercion for writes and the output key/format for change feeds.
+# compile() turns each map into plain dict lookups and generated row encoders
+# once at import, so handlers don't rebuild alias dicts on every request.
+
+
+class FieldError(ValueError):
+    """Bad input value for a mapped field; handlers answer 400 with the message."""
+
+
+class Field(NamedTuple):
+    name: str                          # snake_case API key
+    column: Optional[str]              # SQL column (None for joined/read-only values)
+    aliases: Tuple[str, ...] = ()      # extra accepted input labels (Airtable names)
+    kind: str = "raw"                  # write coercion, see COERCERS
+    out: Optional[str] = None          # key in change-feed payloads (default: column)
+    out_kind: str = "raw"              # feed formatting: raw | iso | int
+    select: Optional[str] = None       # SQL expression when not a plain column (reads from `joins`)
+    writable: bool = True
+    feed: bool = True                  # part of the */changes payload
+
+
+# ---- write coercion ----
+
+def _clean_str(v):
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s if s else None
+
+def coerce_01(v):
+    # handles 0/1, "0"/"1", true/false, yes/no
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return 1 if v else 0
+    if isinstance(v, (int, float)):
+        return 1 if v else 0
+    s = str(v).strip().lower()
+    if s in ("1", "true", "t", "yes", "y"):
+        return 1
+    if s in ("0", "false", "f", "no", "n", ""):
+        return 0
+    raise FieldError("must be 0 or 1")
+
+def parse_date(v):
+    # ISO date, ISO datetime (with/without Z), or US mm/dd/yyyy
+    if v in (None, ""):
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    s = str(v).strip()
+    try:
+        if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+            return date.fromisoformat(s[:10])
+        if "/" in s:
+            return datetime.strptime(s, "%m/%d/%Y").date()
+    except ValueError:
+        pass
+    raise FieldError("must be ISO YYYY-MM-DD or mm/dd/yyyy")
+
+def _state2(v):
+    s = _clean_str(v)
+    if s is None:
+        return None
+    s = s.upper()
+    if len(s) != 2 or not s.isalpha():
+        raise FieldError("must be 2 letters (e.g., 'WV')")
+    return s
+
+def _email(v):
+    s = _clean_str(v)
+    return s.lower() if s else None
+
+def _int(v):
+    if v in (None, ""):
+        return None
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        raise FieldError("must be an integer")
+
+COERCERS = {
+    "raw": None,
+    "text": _clean_str,
+    "bool01": coerce_01,
+    "date": parse_date,
+    "state2": _state2,
+    "email": _email,
+    "int": _int,
+}
+
+
+def _snake(label: str) -> str:
+    return label.strip().lower().replace(" ", "_")
+
+
+class TableMap:
+    """
+    Compiled mapping for one table.
+
+      decode(fields)      -> {api_key: value}   (Airtable labels / columns / snake_case accepted)
+      to_sql(decoded)     -> ([columns], [values]) for writable keys present, coerced
+      feed_encoder        -> row tuple (feed_select order) -> ("upsert"|"delete", payload)
+      select_fields(spec) -> TableMap over a ?fields= subset; same SQL shapes, narrower
+    """
+
+    def __init__(self, table: str, alias: str, pk: str, fields: list, joins: str = "",
+                 ts_column: str = "updated_at", deleted: Tuple[str, object] = ("is_deleted", True),
+                 watch: Tuple[str, ...] = ()):
+        self.table = table
+        self.alias = alias
+        self.fields = fields
+        self.by_name = {f.name: f for f in fields}
+        self.pk = self.by_name[pk]
+        self.joins = joins
+        self.ts_column = ts_column
+        self.deleted = deleted
+        self.watch = watch  # joined tables whose edits show up in feed rows
+        self.base = self    # the full map a select_fields() view was cut from
+        self.pick = None    # base feed row -> this view's feed row
+        self._compile()
+
+    # ---- compile once ----
+
+    def _compile(self):
+        lookup = {}
+        for f in self.fields:
+            labels = [f.name] + ([f.column] if f.column else []) + list(f.aliases) + ([f.out] if f.out else [])
+            for label in labels:
+                lookup.setdefault(label, f.name)
+                lookup.setdefault(_snake(label), f.name)
+        self._lookup = lookup
+        self._misses = {}
+
+        self._writers = [
+            (f.name, f.column, COERCERS[f.kind]) for f in self.fields if f.writable and f.column
+        ]
+        self._labels = {f.name: f.column or f.name for f in self.fields}
+
+        a = self.alias
+        self.ts_sql = f"{a}.[{self.ts_column}]"
+        self.pk_sql = f"{a}.[{self.pk.column}]"
+        self.from_sql = f"dbo.[{self.table}] {a}" + (f"\n    {self.joins}" if self.joins else "")
+        self.feed_fields = [f for f in self.fields if f.feed]
+        self.feed_columns = [self.select_expr(f) for f in self.feed_fields]
+        self.feed_select = ",\n      ".join(self.feed_columns)
+        self.feed_encoder = self.compile_encoder(self.feed_fields)
+        self.feed_pk_index = self.feed_fields.index(self.pk)
+        self.feed_cursor_index = len(self.feed_fields) + 2
+        self.record_probe_sql = (
+            f"SELECT {cursor_ts_column(self.ts_sql)} FROM dbo.[{self.table}] {a} WHERE {self.pk_sql} = ?"
+        )
+        self.record_names = [f.name for f in self.fields]
+        self._record_select = (
+            f"SELECT {', '.join(self.select_expr(f, f.name) for f in self.fields)}\n"
+            f"FROM {self.from_sql}\n"
+        )
+        self.record_sql = f"{self._record_select}WHERE {self.pk_sql} = ?"
+
+    def select_expr(self, f: Field, as_name: Optional[str] = None) -> str:
+        if f.select:
+            return f"{f.select} AS [{as_name or f.out or f.name}]"
+        return f"{self.alias}.[{f.column}]" + (f" AS [{as_name}]" if as_name else "")
+
+    def select_fields(self, spec: Optional[str]) -> "TableMap":
+        """
+        ?fields=a,b -> a TableMap over those fields plus the pk (self when spec is empty).
+        Labels resolve like decode(): API keys, columns, feed output keys, Airtable aliases.
+        The joins are kept only when a selected field reads from them.
+        """
+        if not spec:
+            return self
+        names = set()
+        for label in spec.split(","):
+            label = label.strip()
+            if not label:
+                continue
+            name = self._lookup.get(label) or self._lookup.get(_snake(label))
+            if name is None:
+                raise FieldError(f"Unknown field '{label}' in 'fields'")
+            names.add(name)
+        return self._view(frozenset(names))
+
+    @lru_cache(maxsize=128)
+    def _view(self, names: frozenset) -> "TableMap":
+        fields = [f for f in self.fields if f.name in names or f is self.pk]
+        if len(fields) == len(self.fields):
+            return self
+        joined = any(f.select for f in fields)
+        view = TableMap(
+            self.table, self.alias, self.pk.name, fields, joins=self.joins if joined else "",
+            ts_column=self.ts_column, deleted=self.deleted, watch=self.watch if joined else (),
+        )
+        view.base = self
+        n = len(self.feed_fields)
+        view.pick = itemgetter(*[self.feed_fields.index(f) for f in view.feed_fields], n, n + 1, n + 2)
+        return view
+
+    def compile_encoder(self, fields: list):
+        """
+        Generates `enc(row) -> (op, payload)` for a row laid out as
+        fields + [deleted flag, updated_at], reading values by position.
+        """
+        body, env = [], {"_iso": _iso, "_int01": _int01}
+        for i, f in enumerate(fields):
+            key = f.out or f.column or f.name
+            expr = f"r[{i}]"
+            if f.out_kind == "iso":
+                expr = f"_iso({expr})"
+            elif f.out_kind == "int":
+                expr = f"_int01({expr})"
+            body.append(f"{key!r}: {expr}")
+        n = len(fields)
+        body.append(f"'updated_at': _iso(r[{n + 1}])")
+        pk_key = self.pk.out or self.pk.column
+        pk_idx = fields.index(self.pk)
+        flag, when = self.deleted
+        test = f"r[{n}]" if when is True else f"r[{n}] == {when!r}"
+        src = (
+            "def enc(r):\n"
+            f"    if {test}:\n"
+            f"        return 'delete', {{{pk_key!r}: r[{pk_idx}], 'updated_at': _iso(r[{n + 1}])}}\n"
+            f"    return 'upsert', {{{', '.join(body)}}}\n"
+        )
+        exec(src, env)
+        return env["enc"]
+
+    # ---- requests ----
+
+    def key_for(self, label: str) -> str:
+        key = self._lookup.get(label)
+        if key is not None:
+            return key
+        key = self._misses.get(label)
+        if key is None:
+            snake = _snake(label or "")
+            key = self._lookup.get(label.strip(), self._lookup.get(snake, snake))
+            if len(self._misses) < 1024:
+                self._misses[label] = key
+        return key
+
+    def decode(self, fields: Optional[dict]) -> dict:
+        lookup = self._lookup
+        out = {}
+        for k, v in (fields or {}).items():
+            key = lookup.get(k)
+            out[key if key is not None else self.key_for(k or "")] = v
+        return out
+
+    def to_sql(self, decoded: dict, skip: Tuple[str, ...] = ()) -> Tuple[list, list]:
+        cols, vals = [], []
+        for name, column, coerce in self._writers:
+            if name in decoded and name not in skip:
+                v = decoded[name]
+                if coerce is not None:
+                    try:
+                        v = coerce(v)
+                    except FieldError as e:
+                        raise FieldError(f"{column} {e}")
+                cols.append(column)
+                vals.append(v)
+        return cols, vals
+
+    def coerce(self, name: str, value):
+        coerce = COERCERS[self.by_name[name].kind]
+        if coerce is None:
+            return value
+        try:
+            return coerce(value)
+        except FieldError as e:
+            raise FieldError(f"{self._labels[name]} {e}")
+
+    def _feed_sql(self, top_sql: str, where_sql: str, order_sql: str) -> str:
+        return f"""
+    SELECT {top_sql}
+      {self.feed_select},
+      {self.alias}.[{self.deleted[0]}],
+      {self.ts_sql},
+      {cursor_ts_column(self.ts_sql)} AS cursor_ts
+    FROM {self.from_sql}
+    WHERE {where_sql}{order_sql}
+    """
+
+    def feed_query(self, top_sql: str, where_sql: str) -> str:
+        """*/changes SELECT laid out for feed_encoder: feed fields, deleted flag, updated_at, cursor_ts."""
+        return self._feed_sql(
+            top_sql, f"{where_sql} AND {self.ts_sql} <= ?", f"\n    ORDER BY {self.ts_sql}, {self.pk_sql}"
+        )
+
+    def feed_tail_query(self) -> str:
+        """The newest TOP (?) rows in feed layout, newest first (change journal seed)."""
+        return self._feed_sql("TOP (?)", "1 = 1", f"\n    ORDER BY {self.ts_sql} DESC, {self.pk_sql} DESC")
+
+    @lru_cache(maxsize=64)
+    def records_query(self, n: int) -> str:
+        """record_sql for n primary keys (bulk ?ids= reads); rows come back in no particular order."""
+        return f"{self._record_select}WHERE {self.pk_sql} IN ({', '.join('?' * n)})"
+
+    @lru_cache(maxsize=64)
+    def feed_keys_query(self, n: int) -> str:
+        """Feed-layout rows for n primary keys (change journal refresh after a write)."""
+        return self._feed_sql("", f"{self.pk_sql} IN ({', '.join('?' * n)})", "")
+
+    def probe_query(self, where_sql: str) -> str:
+        """
+        Cheap "anything changed?" check over feed_query()'s range: row count, newest updated_at
+        and checksum_column() (index-only on (updated_at, pk)), then newest updated_at of
+        each watched table.
+        """
+        watched = "".join(
+            f",\n      (SELECT {cursor_ts_column('MAX([' + self.ts_column + '])')} FROM dbo.[{t}])" for t in self.watch
+        )
+        return f"""
+    SELECT COUNT_BIG(*),
+      {cursor_ts_column('MAX(' + self.ts_sql + ')')},
+      {checksum_column(self.ts_sql, self.pk_sql)}{watched}
+    FROM dbo.[{self.table}] {self.alias}
+    WHERE {where_sql}
+    """
+
+    @lru_cache(maxsize=256)
+    def set_clause(self, cols: Tuple[str, ...]) -> str:
+        return ", ".join(f"[{c}] = ?" for c in cols)
+
+    @lru_cache(maxsize=256)
+    def insert_parts(self, cols: Tuple[str, ...]) -> Tuple[str, str]:
+        return ", ".join(f"[{c}]" for c in cols), ", ".join("?" for _ in cols)
+
+
+def _iso(v):
+    return v.isoformat() if v is not None else None
+
+def _int01(v):
+    return int(v) if v is not None else None
+
+
+# ---- registry ----
+
+BUILDING = TableMap("Building", "b", "building_id", [
+    Field("building_id", "building_id", writable=False),
+    Field("mortgagee_id", "mortgagee_id"),
+    Field("address_normalized", "Address Normalized"),
+    Field("bld_number", "Bld#"),
+    Field("owner_occupied", "Owner Occupied", kind="bool01"),
+    Field("street_address", "Street Address"),
+    Field("city", "City"),
+    Field("state", "State"),
+    Field("zip_code", "Zip"),
+    Field("county", "County"),
+    Field("units", "Units"),
+    Field("construction_code", "construction_code"),
+    Field("year_built", "Year Built"),
+    Field("stories", "Stories"),
+    Field("square_feet", "Square Feet"),
+    Field("desired_building_coverage", "Desired Building Coverage"),
+    Field("fire_alarm", "Fire Alarm", kind="bool01"),
+    Field("sprinkler_system", "Sprinkler System", kind="bool01"),
+    Field("roof_year_updated", "roof_year_updated"),
+    Field("plumbing_year_updated", "plumbing_year_updated"),
+    Field("electrical_year_updated", "electrical_year_updated"),
+    Field("hvac_year_updated", "hvac_year_updated"),
+    Field("entity_id", "entity_id"),
+    Field("entity_legal_name", None, out="Entity Legal Name", select="e.legal_name", writable=False),
+], joins="LEFT JOIN dbo.[Entity] e\n      ON e.[Entity_Id] = b.[entity_id]", watch=("Entity",))
+
+ENTITY = TableMap("Entity", "e", "entity_id", [
+    Field("entity_id", "Entity_Id", writable=False),
+    Field("legal_name", "legal_name", kind="text"),
+    Field("state_registration", "State Registration", kind="state2"),
+    Field("entity_start_date", "Entity Start Date", kind="date", out_kind="iso"),
+    Field("fein", "FEIN", kind="text"),
+    Field("sos_url", "sos_url", kind="text"),
+])
+
+CLIENT_CONTACT = TableMap("ClientContact", "c", "client_contact_id", [
+    Field("client_contact_id", "client_contact_id", ("Client Contact Id", "Client Contact ID"), writable=False),
+    Field("first_name", "first_name", ("First Name",), kind="text"),
+    Field("last_name", "last_name", ("Last Name",), kind="text"),
+    Field("mailing_address", "mailing_address", ("Mailing Address",), kind="text"),
+    Field("physical_address", "physical_address", ("Physical Address",), kind="text"),
+    Field("phone", "phone", ("Phone",), kind="text", out="Phone"),
+    Field("email", "email", ("Email",), kind="email", out="Email"),
+    Field("is_primary", "is_primary", ("Is Primary",), kind="bool01"),
+    Field("parent_contact_id", "parent_contact_id", ("Parent Contact Id", "Parent Contact ID"), kind="int"),
+    # read-only, for ?fields= (the feed sends these as the delete op and updated_at), formatted like
+    # the full record (CLIENT_CONTACT_RECORD in main.py)
+    Field("is_deleted", "is_deleted", writable=False, feed=False),
+    Field("deleted_at", "deleted_at", select="CONVERT(VARCHAR(19), c.[deleted_at], 126)", writable=False, feed=False),
+    Field("updated_at", "updated_at", select="CONVERT(VARCHAR(19), c.[updated_at], 126)", writable=False, feed=False),
+])
+
+BUILDING_CONTACT = TableMap("Building_Contact", "bc", "building_contact_id", [
+    Field("building_contact_id", "building_contact_id", writable=False),
+    Field("building_id", "building_id"),
+    Field("client_contact_id", "client_contact_id"),
+    Field("role", "role"),
+    Field("is_primary", "is_primary", kind="bool01", out_kind="int"),
+    Field("is_active", "is_active", kind="bool01", out_kind="int"),
+], deleted=("is_active", 0))
+
+TABLES = {
+    "building": BUILDING,
+    "entity": ENTITY,
+    "clientcontact": CLIENT_CONTACT,
+    "building_contact": BUILDING_CONTACT,
+}
@@ -0,0 +1,191 @@
+﻿import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+# Replays for the Airtable write endpoints (/airtable/*/ingest|update|delete|restore).
+# Automations retry on timeouts; a retry carrying the same key gets the first answer back
+# (status, headers, body) without running the handler or touching SQL Server.
+#   - key: the Idempotency-Key header, else the Airtable record id(s) of the payload
+#     ({"id": "rec..."} or records[].id), scoped by table (/airtable/buildings/...)
+#   - every entry remembers a hash of the path and body: a header key reused for another request
+#     is refused (422); a record-id key with another request is the record's next write
+#     (an edit, or delete -> restore -> delete), so it runs and replaces the entry
+#   - a duplicate arriving while the first is still running waits for it, then replays
+#   - only answers below 500 are kept, so a retry after a DB error or pool timeout runs again
+#   - bounded: least recently used keys are evicted past `capacity`; entries expire after `ttl`
+
+AIRTABLE_WRITES = re.compile(r"^/airtable/[^/]+/(ingest|update|delete|restore)$")
+MAX_KEY_LENGTH = 255
+
+
+class Entry(NamedTuple):
+    fingerprint: bytes
+    status: int
+    headers: list
+    body: bytes
+    expires: float
+
+
+class IdempotencyStore:
+    def __init__(self, capacity: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = max(0, capacity)
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (table prefix, key) -> Entry
+        self._stats = {"stored": 0, "replays": 0, "conflicts": 0, "waits": 0,
+                       "evictions": 0, "expirations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.ttl > 0
+
+    def get(self, key: tuple) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= self._clock():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, fingerprint: bytes, status: int, headers: list, body: bytes):
+        with self._lock:
+            self._entries[key] = Entry(fingerprint, status, headers, body, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            self._stats["stored"] += 1
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def count(self, what: str):
+        with self._lock:
+            self._stats[what] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out.update(entries=len(self._entries), capacity=self.capacity, ttl=self.ttl)
+        return out
+
+
+def record_key(body: bytes) -> Optional[str]:
+    """Airtable record id(s) of a write payload ({"id": "rec..."} or {"records": [{"id": ...}]}), or None."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if "id" in payload:
+        ids = [payload["id"]]
+    else:
+        records = payload.get("records")
+        ids = [r.get("id") for r in records if isinstance(r, dict)] if isinstance(records, list) else []
+    ids = [i for i in ids if isinstance(i, str) and i.startswith("rec")]
+    return "airtable:" + ",".join(ids) if ids else None
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware; innermost, so replays still go through compression and metrics:
+      app.add_middleware(IdempotencyMiddleware, store=IdempotencyStore(10000, ttl=600))
+    """
+
+    def __init__(self, app, store: IdempotencyStore, paths: re.Pattern = AIRTABLE_WRITES,
+                 max_body: int = 256 * 1024):
+        self.app = app
+        self.store = store
+        self.paths = paths
+        self.max_body = max_body  # larger answers are passed through but not kept
+        self._inflight = {}       # key -> asyncio.Event set when the first request finishes
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope.get("method") != "POST" or not self.store.enabled
+                or not self.paths.match(scope["path"])):
+            return await self.app(scope, receive, send)
+
+        body, more = b"", True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                return await self.app(scope, receive, send)  # client went away; let the app see it
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        header = None
+        for name, value in scope.get("headers") or ():
+            if name == b"idempotency-key":
+                header = value.decode("latin-1").strip()
+                break
+        if header is not None and not 0 < len(header) <= MAX_KEY_LENGTH:
+            return await _json(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        name = header or record_key(body)
+        if name is None:
+            return await self.app(scope, replay_receive, send)
+
+        path = scope["path"]
+        key = (path.rsplit("/", 1)[0], name)
+        fingerprint = hashlib.sha256(path.encode("utf-8") + b"\n" + body).digest()
+        while True:
+            entry = self.store.get(key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self.store.count("replays")
+                await send({"type": "http.response.start", "status": entry.status,
+                            "headers": entry.headers + [(b"idempotent-replayed", b"true")]})
+                return await send({"type": "http.response.body", "body": entry.body})
+            running = self._inflight.get(key)
+            if running is not None:
+                # even with a stored entry for another body: this may be a retry of the running one
+                self.store.count("waits")
+                await running.wait()
+                continue
+            if entry is not None and header is not None:
+                self.store.count("conflicts")
+                return await _json(send, 422, "Idempotency-Key was already used for a different request")
+            break
+
+        done = self._inflight[key] = asyncio.Event()
+        start, chunks, size = None, [], 0
+
+        async def capture(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= self.max_body:
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture)
+        finally:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            done.set()
+        if start is not None and start["status"] < 500 and size <= self.max_body:
+            self.store.put(key, fingerprint, start["status"], list(start.get("headers") or ()), b"".join(chunks))
+
+
+async def _json(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}, separators=(",", ":")).encode("utf-8")
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]})
+    await send({"type": "http.response.body", "body": body})
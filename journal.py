@@ -0,0 +1,216 @@
+﻿import bisect
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+import changefeed
+
+# In-process change journal for the */changes feeds.
+#
+# Per table it keeps the newest `capacity` feed rows (feed_query() layout), one per key,
+# ordered on the feed's (cursor_ts, pk) keyset. Write handlers re-read the rows they touched
+# and record() them; startup seeds each table from feed_tail_query().
+#
+# A journal is complete above its floor: every row whose (cursor_ts, pk) > floor is held
+# (floor None = the whole table). A page whose lower bound is at or above the floor can be
+# served from memory, provided the SQL probe (count, newest updated_at, checksum over the
+# range) matches the journal's own summary. A mismatch means an out-of-band edit (SSMS,
+# another worker, a trigger), so the page is read from SQL and the table reseeded.
+
+
+class Page:
+    __slots__ = ("rows", "summary")
+
+    def __init__(self, rows: list, summary: tuple):
+        self.rows = rows          # up to limit + 1 rows with bound < key and ts <= now
+        self.summary = summary    # (count, max cursor_ts, checksum) over bound < key
+
+
+class TableJournal:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.keys = []          # sorted (cursor_ts, pk)
+        self.terms = []         # row_checksum() of each key, aligned with keys
+        self.checksum = 0       # sum(terms), kept up to date by _put/_drop
+        self.rows = {}          # pk -> ((cursor_ts, pk), row)
+        self.floor = None
+        self.ready = False
+        self.watch = ()         # watched tables' newest updated_at the rows reflect
+        self.watch_pending = False
+        self.seeded_at = 0.0
+
+    def _put(self, key: tuple, row: tuple):
+        old = self.rows.get(key[1])
+        if old is not None:
+            if old[0] > key:
+                return  # a slower re-read of an older version
+            self._remove(old[0])
+        i = bisect.bisect_left(self.keys, key)
+        term = changefeed.row_checksum(*key)
+        self.keys.insert(i, key)
+        self.terms.insert(i, term)
+        self.checksum += term
+        self.rows[key[1]] = (key, row)
+        while len(self.keys) > self.capacity:
+            evicted = self.keys.pop(0)
+            self.checksum -= self.terms.pop(0)
+            del self.rows[evicted[1]]
+            self.floor = evicted
+
+    def _drop(self, pk):
+        old = self.rows.pop(pk, None)
+        if old is not None:
+            self._remove(old[0])
+
+    def _remove(self, key: tuple):
+        i = bisect.bisect_left(self.keys, key)
+        del self.keys[i]
+        self.checksum -= self.terms.pop(i)
+
+    def checksum_from(self, start: int) -> int:
+        """Checksum of keys[start:]: sums whichever side of start is shorter."""
+        if start <= len(self.terms) - start:
+            return self.checksum - sum(self.terms[:start])
+        return sum(self.terms[start:])
+
+
+class ChangeJournal:
+    """
+    journal.page(table, bound, now_ts, limit)  -> Page | None (None: outside the window)
+    journal.record(table, rows, removed=())      after a write, with the re-read feed rows
+    journal.seed(table, rows, complete, watch)   rows from feed_tail_query(), oldest first
+    """
+
+    def __init__(self, capacity: int, reseed_interval: float = 30.0):
+        self.capacity = capacity
+        self.reseed_interval = reseed_interval
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "mismatches": 0, "seeds": 0, "recorded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _table(self, name: str) -> TableJournal:
+        tj = self._tables.get(name)
+        if tj is None:
+            tj = self._tables[name] = TableJournal(self.capacity)
+        return tj
+
+    @staticmethod
+    def _key(table, row) -> tuple:
+        return row[table.feed_cursor_index], row[table.feed_pk_index]
+
+    def seed(self, table, rows: list, complete: bool, watch: tuple = ()):
+        """complete=True when rows is the whole table (fewer rows than capacity)."""
+        fresh = TableJournal(self.capacity)
+        for row in rows:
+            fresh._put(self._key(table, row), tuple(row))
+        if not complete and fresh.floor is None and fresh.keys:
+            # nothing was evicted (capacity + 1 rows set the floor themselves): rows below
+            # the oldest one we got are missing, so it becomes the floor
+            fresh.floor = fresh.keys[0]
+            fresh._drop(fresh.keys[0][1])
+        with self._lock:
+            old = self._tables.get(table.table)
+            if old is not None:
+                # keep versions recorded by writes that raced the seed query
+                for key, row in old.rows.values():
+                    if fresh.floor is None or key > fresh.floor:
+                        fresh._put(key, row)  # _put keeps whichever version is newer
+            fresh.ready = True
+            fresh.watch = watch
+            fresh.seeded_at = time.monotonic()
+            self._tables[table.table] = fresh
+            self._stats["seeds"] += 1
+
+    def record(self, table, rows: Iterable[tuple], removed: Iterable[int] = ()):
+        with self._lock:
+            tj = self._table(table.table)
+            for row in rows:
+                tj._put(self._key(table, row), tuple(row))
+                self._stats["recorded"] += 1
+            for pk in removed:
+                tj._drop(pk)
+
+    def rows_where(self, table, test) -> list:
+        """pks of journal rows matching test(row), e.g. buildings of a renamed entity."""
+        with self._lock:
+            tj = self._tables.get(table.table)
+            return [pk for pk, (_, row) in tj.rows.items() if test(row)] if tj else []
+
+    def watch_changed(self, table):
+        """A watched table was written here; the next probe's watch values are ours."""
+        with self._lock:
+            tj = self._tables.get(table.table)
+            if tj is not None:
+                tj.watch_pending = True
+
+    def invalidate(self, table):
+        with self._lock:
+            tj = self._tables.get(table.table)
+            if tj is not None:
+                tj.ready = False
+
+    def needs_seed(self, table) -> bool:
+        with self._lock:
+            tj = self._tables.get(table.table)
+            return self.enabled and (tj is None or not tj.ready) and (
+                tj is None or time.monotonic() - tj.seeded_at >= self.reseed_interval
+            )
+
+    def mark_seeding(self, table):
+        """Throttles reseeds: a failed or mismatched table is retried after reseed_interval."""
+        with self._lock:
+            self._table(table.table).seeded_at = time.monotonic()
+
+    def page(self, table, bound: Optional[tuple], now_ts: str, limit: Optional[int]) -> Optional[Page]:
+        """bound is the exclusive (cursor_ts, pk) lower bound; pk may be float('inf') for since=."""
+        with self._lock:
+            tj = self._tables.get(table.table)
+            if tj is None or not tj.ready or (tj.floor is not None and (bound is None or bound < tj.floor)):
+                self._stats["misses"] += 1
+                return None
+            start = 0 if bound is None else bisect.bisect_right(tj.keys, bound)
+            end = len(tj.keys)
+            rows, take = [], None if limit is None else limit + 1
+            for i in range(start, end):
+                key = tj.keys[i]
+                if key[0] > now_ts or (take is not None and len(rows) >= take):
+                    break
+                rows.append(tj.rows[key[1]][1])
+            summary = (
+                end - start,
+                tj.keys[-1][0] if start < end else None,
+                tj.checksum_from(start),
+            )
+            return Page(rows, summary)
+
+    def verify(self, table, page: Page, probe: tuple) -> bool:
+        """probe = table.probe_query() row: (count, max cursor_ts, checksum, *watched)."""
+        count, newest, checksum = probe[0], probe[1], probe[2] or 0
+        with self._lock:
+            tj = self._tables.get(table.table)
+            if tj is None or not tj.ready:
+                return False
+            watch = tuple(probe[3:])
+            if tj.watch_pending:
+                tj.watch, tj.watch_pending = watch, False
+            ok = page.summary == (count, newest, checksum) and watch == tj.watch
+            if ok:
+                self._stats["hits"] += 1
+            else:
+                self._stats["mismatches"] += 1
+                tj.ready = False
+            return ok
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["capacity"] = self.capacity
+            out["tables"] = {
+                name: {"rows": len(tj.rows), "ready": tj.ready, "floor": list(tj.floor) if tj.floor else None}
+                for name, tj in self._tables.items()
+            }
+        return out
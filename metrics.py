@@ -0,0 +1,392 @@
+﻿import bisect
+import contextvars
+import logging
+import math
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+# Prometheus metrics, text exposition format 0.0.4, without the prometheus_client dependency.
+#   - Counter / Gauge / Histogram have fixed label names; one child per label-value tuple
+#   - REGISTRY.render() writes every metric, then the collectors' scrape-time samples
+#     (pool, executor, journal and compression stats that are already counted elsewhere)
+#   - MetricsMiddleware times each request under its route template and puts a RequestTimings in a
+#     contextvar, so DB statements and Airtable calls made while serving it (including in
+#     BlockingExecutor / threadpool workers, which copy the context) are attributed to its route.
+#     The route is read from scope["route"], which the router fills in; nothing is matched twice
+#   - the same RequestTimings sums the request's phases (connect, execute, fetch, commit,
+#     serialize) for the Server-Timing header and the slow-request log
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BACKGROUND = "background"  # route label for work outside a request (journal seeding, startup)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 2500, 5000)
+
+PHASES = ("connect", "execute", "fetch", "commit", "serialize")
+
+_request = contextvars.ContextVar("metrics_request", default=None)
+logger = logging.getLogger(__name__)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope["path"] if "endpoint" in scope else "unmatched"  # plain Starlette routes: /docs
+
+
+def current_route() -> str:
+    req = _request.get()
+    return BACKGROUND if req is None else route_label(req.scope)
+
+
+class RequestTimings:
+    """
+    Seconds and call count per phase for one request. A request's DB work runs one call at a
+    time (in whichever worker thread), so the sums are updated without a lock.
+    """
+
+    __slots__ = ("scope", "started", "phases")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase: str, seconds: float):
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self) -> str:
+        """connect;dur=0.41, execute;dur=12.3;desc="3 statements", ..., total;dur=15.0 (milliseconds)"""
+        parts = []
+        for phase in PHASES:
+            entry = self.phases.get(phase)
+            if entry is None:
+                continue
+            desc = f';desc="{entry[1]} statement{"" if entry[1] == 1 else "s"}"' if phase == "execute" else ""
+            parts.append(f"{phase};dur={entry[0] * 1000:.2f}{desc}")
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+    def summary(self) -> str:
+        return " ".join(
+            f"{p}={e[0] * 1000:.1f}ms" + (f"/{e[1]}" if p == "execute" else "")
+            for p, e in ((p, self.phases.get(p)) for p in PHASES) if e is not None
+        )
+
+
+def add_phase(phase: str, seconds: float):
+    """Adds time spent in a phase to the current request's timings (no-op outside a request)."""
+    req = _request.get()
+    if req is not None:
+        req.add(phase, seconds)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(v) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _check(self, values: tuple):
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {values}")
+
+    def value(self, *labels):
+        """Current value of one child (tests, /health-style summaries)."""
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            if labels not in self._values:
+                self._check(labels)
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            if labels not in self._values:
+                self._check(labels)
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Cumulative buckets are built at render time; each child keeps per-bucket counts, sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                self._check(labels)
+                child = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            child[i] += 1
+            child[-1] += value
+
+    def value(self, *labels):
+        """(count, sum) of one child."""
+        with self._lock:
+            child = self._values.get(labels)
+            return (sum(child[:-1]), child[-1]) if child else (0, 0.0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, child in items:
+            running = 0
+            for bound, n in zip(self.buckets + (math.inf,), child):
+                running += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(child[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {running}")
+        return lines
+
+
+class Registry:
+    """
+    Holds the metrics and scrape-time collectors. A collector is a callable returning
+    (name, kind, help, samples) tuples, samples being [(labels dict, value), ...].
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[tuple]], name: Optional[str] = None):
+        """Registers fn under name (default: its qualified name); registering a name again replaces it."""
+        with self._lock:
+            self._collectors[name or f"{fn.__module__}.{fn.__qualname__}"] = fn
+        return fn
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        for fn in collectors:
+            try:
+                families = list(fn())
+            except Exception as e:  # a broken collector must not take /metrics down
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} failed: {_escape(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency, start to last body byte", ("method", "route", "status"))
+DB_STATEMENTS = REGISTRY.histogram(
+    "db_statement_duration_seconds", "pyodbc/ORM execute() time per statement, by the route that ran it",
+    ("route",), DB_BUCKETS)
+DB_STATEMENT_ERRORS = REGISTRY.counter("db_statement_errors_total", "Statements that raised", ("route",))
+CHANGES_ROWS = REGISTRY.histogram(
+    "changes_rows_returned", "Rows per */changes page (per table for /airtable/changes)", ("table",), ROW_BUCKETS)
+CHANGES_PAGES = REGISTRY.counter(
+    "changes_pages_total", "*/changes answers by source: journal, sql, not_modified, head", ("table", "source"))
+AIRTABLE_REQUESTS = REGISTRY.histogram(
+    "airtable_request_duration_seconds", "Airtable API call latency", ("op", "status"))
+AIRTABLE_RATE_LIMITED = REGISTRY.counter(
+    "airtable_rate_limited_total", "Airtable 429 answers (each is followed by a Retry-After wait)", ("op",))
+
+# requests being served by every MetricsMiddleware in the process; the route is only known once
+# the router has run, so they are counted per route at scrape time
+_active_lock = threading.Lock()
+_active = {}  # id(scope) -> scope
+
+
+def _in_flight():
+    with _active_lock:
+        scopes = list(_active.values())
+    counts = {}
+    for scope in scopes:
+        route = route_label(scope)
+        counts[route] = counts.get(route, 0) + 1
+    yield "http_requests_in_flight", "gauge", "Requests being served", [
+        ({"route": route}, n) for route, n in sorted(counts.items())]
+
+
+REGISTRY.collector(_in_flight, name="http_requests_in_flight")
+
+
+def observe_db(phase: str, seconds: float, failed: bool = False):
+    """ConnectionPool timer: phase is connect, execute, fetch or commit."""
+    req = _request.get()
+    if req is not None:
+        req.add(phase, seconds)
+    if phase == "execute":
+        route = BACKGROUND if req is None else route_label(req.scope)
+        DB_STATEMENTS.observe(seconds, route)
+        if failed:
+            DB_STATEMENT_ERRORS.inc(route)
+
+
+def observe_airtable(op: str, status, seconds: float):
+    """status is the HTTP status code, or "error" for transport failures."""
+    AIRTABLE_REQUESTS.observe(seconds, op, str(status))
+    if status == 429:
+        AIRTABLE_RATE_LIMITED.inc(op)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    observe_db("execute", time.perf_counter() - conn.info["metrics_started"].pop())
+
+
+def _execute_error(ctx):
+    started = ctx.connection.info.get("metrics_started") if ctx.connection is not None else None
+    if started:
+        observe_db("execute", time.perf_counter() - started.pop(), failed=True)
+
+
+def time_sqlalchemy(target):
+    """
+    Feeds the ORM's statements into db_statement_duration_seconds and the request's execute phase.
+    target is an engine or the Engine class (every engine); calling it twice is harmless.
+    """
+    from sqlalchemy import event
+
+    for name, fn in (("before_cursor_execute", _before_execute), ("after_cursor_execute", _after_execute),
+                     ("handle_error", _execute_error)):
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware:
+      app.add_middleware(MetricsMiddleware, server_timing=True, slow_ms=500)
+    Requests are labelled with their route template (/buildings/{building_id}), so label
+    cardinality stays at the number of routes; paths that match nothing are "unmatched".
+    Requests in progress feed the module's http_requests_in_flight collector, shared by every app.
+    server_timing adds a Server-Timing header with the phases spent before the response started;
+    requests slower than slow_ms (start to last byte) are logged with their full breakdown.
+    """
+
+    def __init__(self, app, skip: Iterable[str] = ("/metrics",), server_timing: bool = True,
+                 slow_ms: Optional[float] = None):
+        self.app = app
+        self.skip = frozenset(skip)
+        self.server_timing = server_timing
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            return await self.app(scope, receive, send)
+        req = RequestTimings(scope)
+        status = 500
+
+        async def wrapped_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers") or ())
+                    headers.append((b"server-timing", req.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request.set(req)
+        with _active_lock:
+            _active[id(scope)] = scope
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            elapsed = time.perf_counter() - req.started
+            route = route_label(scope)
+            HTTP_REQUESTS.observe(elapsed, scope["method"], route, str(status))
+            with _active_lock:
+                del _active[id(scope)]
+            _request.reset(token)
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                logger.warning("slow request: %s %s %s %.1fms %s",
+                               scope["method"], route, status, elapsed * 1000, req.summary())
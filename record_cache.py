@@ -0,0 +1,118 @@
+﻿import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+# Read-through cache for the single-record GET/HEAD routes (/buildings/{id}, /entity/{id},
+# /clientcontacts/{id}). Entries are the rendered JSON body plus its ETag, so a hit answers
+# 200/304/HEAD without touching SQL Server or re-serializing.
+#   - keyed by (table, pk); each record keeps one entry per field selection (None = full record)
+#   - bounded: least recently used records are evicted past `capacity`; entries expire after `ttl`
+#   - every write path in this process invalidates the keys it committed, synchronously; ttl
+#     bounds how long a write made elsewhere (another worker, SSMS, an Airtable script) can go unseen
+#   - a fill carries the table's token from before its DB read: if the table was invalidated in
+#     between, the (possibly stale) fill is dropped instead of cached
+
+
+class RecordCache:
+    def __init__(self, capacity: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = max(0, capacity)
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # (table, key) -> {variant: (tag, body, expires, joined)}
+        self._versions = {}            # table -> invalidation count, see token()
+        self._stats = {"hits": 0, "misses": 0, "fills": 0, "stale_fills": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.ttl > 0
+
+    def get(self, table: str, key, variant=None) -> Optional[tuple]:
+        """(etag, body) of a live entry, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            record = self._records.get((table, key))
+            entry = record.get(variant) if record is not None else None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[2] <= self._clock():
+                del record[variant]
+                if not record:
+                    del self._records[(table, key)]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._records.move_to_end((table, key))
+            self._stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def token(self, table: str) -> int:
+        """Taken before reading the row from SQL; put() only caches if nothing was invalidated since."""
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def put(self, table: str, key, variant, tag: str, body: bytes, token: int, joined: bool = False) -> bool:
+        """joined marks bodies that include columns of other tables (see invalidate_joined)."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._versions.get(table, 0) != token:
+                self._stats["stale_fills"] += 1
+                return False
+            record = self._records.get((table, key))
+            if record is None:
+                record = self._records[(table, key)] = {}
+            else:
+                self._records.move_to_end((table, key))
+            record[variant] = (tag, body, self._clock() + self.ttl, joined)
+            self._stats["fills"] += 1
+            while len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+                self._stats["evictions"] += 1
+            return True
+
+    def _bump(self, table: str):
+        self._versions[table] = self._versions.get(table, 0) + 1
+
+    def invalidate(self, table: str, keys: Iterable):
+        """Drops every cached selection of these records; call after the write committed."""
+        with self._lock:
+            self._bump(table)
+            for key in keys:
+                if self._records.pop((table, key), None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def invalidate_joined(self, table: str):
+        """Drops the entries of `table` built with joins, e.g. Building reads showing an Entity's name."""
+        with self._lock:
+            self._bump(table)
+            for rk in [rk for rk in self._records if rk[0] == table]:
+                record = self._records[rk]
+                for variant in [v for v, e in record.items() if e[3]]:
+                    del record[variant]
+                    self._stats["invalidations"] += 1
+                if not record:
+                    del self._records[rk]
+
+    def clear(self, table: Optional[str] = None):
+        with self._lock:
+            tables = {rk[0] for rk in self._records} | set(self._versions) if table is None else {table}
+            for t in tables:
+                self._bump(t)
+            doomed = [rk for rk in self._records if table is None or rk[0] == table]
+            for rk in doomed:
+                del self._records[rk]
+            self._stats["invalidations"] += len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out.update(records=len(self._records), entries=sum(len(r) for r in self._records.values()),
+                       capacity=self.capacity, ttl=self.ttl)
+        lookups = out["hits"] + out["misses"]
+        out["hit_ratio"] = round(out["hits"] / lookups, 4) if lookups else None
+        return out
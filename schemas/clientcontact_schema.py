@@ -1,5 +1,5 @@
 ﻿from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class ClientContactBase(BaseModel):
     first_name: str
@@ -30,3 +30,7 @@ class ClientContactInDB(ClientContactBase):
     class Config:
         orm_mode = True
    
+
+
+class IdList(BaseModel):
+    ids: List[int]
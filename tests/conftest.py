@@ -0,0 +1,32 @@
+﻿import time
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks import fake_airtable, portfolio, run, standin_db
+
+# One app per session: main reads its settings at import time, so it is imported once against a
+# seeded SQLite stand-in (registered as pyodbc) and an in-process fake Airtable.
+SEED_BUILDINGS = 100
+
+
+@pytest.fixture(scope="session")
+def airtable():
+    fake = fake_airtable.FakeAirtable().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture(scope="session")
+def app_main(tmp_path_factory, airtable):
+    path = str(tmp_path_factory.mktemp("standin") / "app.db")
+    standin_db.create_database(path)
+    portfolio.seed_database(path, SEED_BUILDINGS)
+    return run.load_app(path, airtable.url)
+
+
+@pytest.fixture(scope="session")
+def client(app_main):
+    with TestClient(app_main.app) as c:
+        deadline = time.monotonic() + 10
+        while app_main._journal_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)  # let the startup journal seeds hand their connections back
+        yield c
@@ -0,0 +1,82 @@
+﻿import asyncio
+import json
+import time
+import httpx
+import metrics
+from airtable_client import AirtableIndex, base_limiter, list_records, write_records
+
+
+def test_list_records_follows_offset_pages():
+    calls = []
+    def handler(request):
+        calls.append(request.url.params.get("offset"))
+        if request.url.params.get("offset") is None:
+            return httpx.Response(200, json={"records": [{"id": "rec1", "fields": {}}], "offset": "p2"})
+        return httpx.Response(200, json={"records": [{"id": "rec2", "fields": {}}]})
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    records = list(list_records("https://api.test/v0/base/", "key", "airtable_Building", client=client))
+    assert [r["id"] for r in records] == ["rec1", "rec2"]
+    assert calls == [None, "p2"]
+
+def test_index_prefers_building_id_then_address():
+    index = AirtableIndex([
+        {"id": "recA", "fields": {"building_id": 7, "Address Normalized": "1 Main St", "bld_number": 1}},
+        {"id": "recB", "fields": {"Address Normalized": "2 Main St", "bld_number": 1}},
+    ])
+    assert index.find(7, "nowhere", 9) == "recA"
+    assert index.find(None, "2 Main St", 1) == "recB"
+    assert index.find(99, "3 Main St", 1) is None
+
+def test_write_records_batches_by_ten_and_retries_429():
+    seen = []
+    def handler(request):
+        batch = json.loads(request.content)["records"]
+        seen.append((request.method, len(batch)))
+        if len(seen) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"records": [{"id": f"rec{i}"} for i in range(len(batch))]})
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        updates = [{"id": f"rec{i}", "fields": {"building_id": i}} for i in range(25)]
+        creates = [{"fields": {"building_id": 100}}]
+        return await write_records("https://api.test/v0/base/", "key", "airtable_Building", updates, creates, client=client)
+    limited = metrics.AIRTABLE_RATE_LIMITED.value("update")
+    outcomes = asyncio.run(run())
+    assert metrics.AIRTABLE_RATE_LIMITED.value("update") == limited + 1
+    assert [(o["op"], o["count"]) for o in outcomes] == [("update", 10), ("update", 10), ("update", 5), ("create", 1)]
+    assert all(o["ok"] for o in outcomes)
+    assert len(seen) == 5  # four batches plus the one 429 retry
+
+def test_write_records_share_one_limiter_per_base():
+    url = "https://api.test/v0/appShared/"
+    assert base_limiter(url) is base_limiter(url)
+    assert base_limiter(url) is not base_limiter("https://api.test/v0/appOther/")
+
+    def handler(request):
+        return httpx.Response(200, json={"records": [{"id": "rec1"}]})
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return await write_records(url, "key", "airtable_Building", [], [{"fields": {}}], client=client)
+    base_limiter(url).pause(0.3)  # e.g. another sync to this base just got a 429
+    started = time.monotonic()
+    assert asyncio.run(run())[0]["ok"]
+    assert time.monotonic() - started >= 0.3
+
+def test_creates_are_not_resent_after_an_ambiguous_failure():
+    seen = []
+    def handler(request):
+        seen.append(request.method)
+        if len(seen) == 1:
+            raise httpx.ReadTimeout("timed out", request=request)  # Airtable may have created them
+        if len(seen) == 2:
+            return httpx.Response(502, text="bad gateway")
+        return httpx.Response(200, json={"records": [{"id": "rec1"}]})
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        creates = [{"fields": {"building_id": i}} for i in range(20)]
+        return await write_records("https://api.test/v0/appCreates/", "key", "airtable_Building", [], creates,
+                                   client=client, concurrency=1)
+    outcomes = asyncio.run(run())
+    assert seen == ["POST", "POST"]  # each batch sent exactly once
+    assert [(o["ok"], o["status"]) for o in outcomes] == [(False, None), (False, 502)]
+    assert "timed out" in outcomes[0]["error"] and outcomes[1]["error"] == "bad gateway"
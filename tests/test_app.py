@@ -0,0 +1,33 @@
+﻿import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# main is imported in a fresh interpreter with no settings, no .env and no database
+SCRIPT = """
+import sys
+import main
+from fastapi.testclient import TestClient
+assert "pyodbc" not in sys.modules, "pyodbc imported at import time"
+assert main.database._engine is None, "ORM engine created at import time"
+assert main.db_pool.stats()["created"] == 0
+assert main.create_app() is not main.app
+try:
+    with TestClient(main.app):
+        pass
+except RuntimeError as e:
+    assert "DATABASE_URL" in str(e), e
+else:
+    raise AssertionError("startup without settings should fail")
+print("ok")
+"""
+
+
+def test_import_has_no_side_effects_and_startup_checks_settings(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL", "AIRTABLE_API_KEY", "AIRTABLE_BASE_ID")}
+    env["PYTHONPATH"] = ROOT
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "ok"
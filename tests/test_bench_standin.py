@@ -0,0 +1,103 @@
+﻿import sqlite3
+from datetime import datetime, timezone
+from benchmarks import fake_airtable, portfolio, standin_db
+
+
+def test_translate_top_output_and_functions():
+    (st,) = standin_db.translate(
+        "INSERT INTO dbo.[Entity] ([legal_name]) OUTPUT INSERTED.[Entity_Id] VALUES (?);"
+    )
+    assert st.sql == "INSERT INTO [Entity] ([legal_name]) VALUES (?) RETURNING [Entity_Id]"
+
+    (st,) = standin_db.translate("SELECT TOP (?) x FROM dbo.T WHERE ts <= ISNULL(?, SYSUTCDATETIME()) ORDER BY x")
+    assert "LIMIT ?" in st.sql and "TOP" not in st.sql
+    assert st.move_to_end == 0
+    assert "ifnull(" in st.sql.lower() and "sysutcdatetime()" in st.sql
+
+def test_standin_round_trip(tmp_path):
+    path = str(tmp_path / "bench.db")
+    standin_db.create_database(path)
+    rows = portfolio.seed_database(path, 50)
+    assert rows["Building"] == 50
+
+    conn = standin_db.connect(f"DATABASE={path}")
+    cur = conn.cursor()
+    cur.execute("IF OBJECT_ID('tempdb..#ids') IS NOT NULL DROP TABLE #ids; CREATE TABLE #ids (id INT);")
+    cur.execute(
+        "INSERT INTO dbo.ClientContact (first_name, last_name, is_primary) "
+        "OUTPUT INSERTED.client_contact_id INTO #ids VALUES (?, ?, ?);",
+        ["Ada", "Lovelace", 1],
+    )
+    cur.execute("SELECT id FROM #ids;")
+    new_id = cur.fetchone()[0]
+    assert new_id == rows["ClientContact"] + 1
+
+    now = datetime.now(timezone.utc)
+    cur.execute("SELECT TOP (?) building_id, updated_at FROM dbo.Building WHERE updated_at <= ? ORDER BY updated_at", [5, now])
+    page = cur.fetchall()
+    assert len(page) == 5
+    assert isinstance(page[0][1], datetime)
+
+    try:
+        cur.execute("INSERT INTO dbo.Building ([Address Normalized], [Bld#], [Owner Occupied], construction_code, "
+                    "[Fire Alarm], [Sprinkler System]) VALUES (?, 1, 0, 1, 0, 0)", [portfolio.address(1)["address_normalized"]])
+    except standin_db.IntegrityError as e:
+        assert "2627" in str(e)
+    else:
+        raise AssertionError("duplicate address was accepted")
+    conn.close()
+
+def test_fake_airtable_pages_and_batches():
+    fake = fake_airtable.FakeAirtable()
+    fake.seed("airtable_Building", [{"building_id": i} for i in range(250)])
+    status, page, _ = fake.handle("GET", "/v0/appBENCH/airtable_Building?pageSize=100")
+    assert status == 200 and len(page["records"]) == 100 and page["offset"] == "100"
+    status, page, _ = fake.handle("GET", "/v0/appBENCH/airtable_Building?pageSize=100&offset=200")
+    assert len(page["records"]) == 50 and "offset" not in page
+
+    status, _, _ = fake.handle("POST", "/v0/appBENCH/airtable_Building", {"records": [{"fields": {}}] * 11})
+    assert status == 422
+
+def test_output_into_table_variable_returns_the_written_row(tmp_path):
+    path = str(tmp_path / "bench.db")
+    standin_db.create_database(path)
+    cur = standin_db.connect(f"DATABASE={path}").cursor()
+    cur.execute("""
+        SET NOCOUNT ON;
+        DECLARE @row TABLE (client_contact_id INT, first_name NVARCHAR(255), updated_at DATETIME2);
+        INSERT INTO dbo.ClientContact (first_name, last_name, is_primary, updated_at)
+        OUTPUT INSERTED.client_contact_id, INSERTED.first_name, INSERTED.updated_at INTO @row
+        VALUES (?, ?, ?, SYSDATETIME());
+        SELECT client_contact_id, first_name, CONVERT(VARCHAR(19), updated_at, 126) FROM @row;
+    """, ["Ada", "Lovelace", 1])
+    new_id, first, updated = cur.fetchone()
+    assert (new_id, first) == (1, "Ada")
+    assert updated[10] == "T" and len(updated) == 19
+
+def test_set_nocount_outlives_a_parameterless_batch_only(tmp_path):
+    path = str(tmp_path / "bench.db")
+    standin_db.create_database(path)
+    portfolio.seed_database(path, 5)
+    cur = standin_db.connect(f"DATABASE={path}").cursor()
+    cur.execute("SET NOCOUNT ON; UPDATE dbo.Building SET is_deleted = 0 WHERE building_id = ?;", [1])
+    cur.execute("UPDATE dbo.Building SET is_deleted = 0 WHERE building_id = 1;")
+    assert cur.rowcount == 1
+
+    cur.execute("SET NOCOUNT ON; SELECT 1;")
+    cur.execute("UPDATE dbo.Building SET is_deleted = 0 WHERE building_id = 1;")
+    assert cur.rowcount == -1
+    cur.execute("SET NOCOUNT OFF;")
+    cur.execute("UPDATE dbo.Building SET is_deleted = 0 WHERE building_id = 1;")
+    assert cur.rowcount == 1
+
+def test_executemany_keeps_output_into_rows(tmp_path):
+    path = str(tmp_path / "bench.db")
+    standin_db.create_database(path)
+    portfolio.seed_database(path, 5)
+    cur = standin_db.connect(f"DATABASE={path}").cursor()
+    cur.execute("CREATE TABLE #updated (building_id INT);")
+    cur.executemany("UPDATE dbo.Building SET units = ? OUTPUT INSERTED.building_id INTO #updated WHERE building_id = ?",
+                    [(1, 2), (1, 99), (1, 4)])
+    assert cur.rowcount == 2
+    cur.execute("SELECT building_id FROM #updated ORDER BY building_id;")
+    assert [r[0] for r in cur.fetchall()] == [2, 4]
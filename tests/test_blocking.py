@@ -0,0 +1,48 @@
+﻿import asyncio
+import contextvars
+import threading
+import pytest
+from blocking import BlockingExecutor
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_runs_off_the_event_loop_thread_with_caller_context():
+    executor = BlockingExecutor(2)
+
+    def work(x):
+        return x * 2, threading.current_thread().name, request_id.get()
+
+    async def main():
+        request_id.set("abc")
+        return await executor.run(work, 21)
+
+    value, thread_name, rid = asyncio.run(main())
+    executor.shutdown()
+    assert value == 42
+    assert thread_name.startswith("blocking")
+    assert rid == "abc"
+
+def test_bounded_and_counts_failures():
+    executor = BlockingExecutor(1)
+    gate = threading.Event()
+
+    def boom():
+        raise RuntimeError("nope")
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(gate.wait, 1))
+        second = asyncio.ensure_future(executor.run(boom))
+        await asyncio.sleep(0.05)
+        busy = executor.stats()
+        gate.set()
+        await first
+        with pytest.raises(RuntimeError):
+            await second
+        return busy
+
+    busy = asyncio.run(main())
+    executor.shutdown()
+    assert busy["running"] == 1 and busy["queued"] == 1
+    stats = executor.stats()
+    assert stats["completed"] == 1 and stats["failed"] == 1
@@ -0,0 +1,47 @@
+﻿import pytest
+from datetime import datetime, timezone
+import changefeed
+
+
+def test_cursor_round_trip():
+    token = changefeed.encode_cursor("2025-09-27T23:10:00.1234567", 42)
+    assert changefeed.decode_cursor(token) == ("2025-09-27T23:10:00.1234567", 42)
+
+def test_bad_cursor_rejected():
+    with pytest.raises(changefeed.CursorError):
+        changefeed.decode_cursor("not-a-cursor")
+
+def test_combined_cursor_round_trip():
+    cursors = {"building": changefeed.encode_cursor("2025-01-01T00:00:00", 7)}
+    assert changefeed.decode_cursors(changefeed.encode_cursors(cursors)) == cursors
+    for bad in ("not-a-cursor", changefeed.encode_cursors({}), changefeed.encode_cursors({"building": "x"})):
+        with pytest.raises(changefeed.CursorError):
+            changefeed.decode_cursors(bad)
+
+def test_lower_bound_uses_since_without_cursor():
+    since = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sql, params = changefeed.lower_bound("b.updated_at", "b.building_id", since, None)
+    assert sql == "b.updated_at > ?"
+    assert params == [since]
+
+def test_lower_bound_breaks_timestamp_ties_on_id():
+    token = changefeed.encode_cursor("2025-01-01T00:00:00", 7)
+    sql, params = changefeed.lower_bound("b.updated_at", "b.building_id", None, token)
+    assert "b.building_id > ?" in sql
+    assert params == ["2025-01-01T00:00:00", "2025-01-01T00:00:00", 7]
+
+def test_split_page_keeps_limit_rows():
+    rows, more = changefeed.split_page([1, 2, 3], 2)
+    assert rows == [1, 2] and more
+    rows, more = changefeed.split_page([1, 2], 2)
+    assert rows == [1, 2] and not more
+
+def test_etag_is_stable_and_weakly_compared():
+    tag = changefeed.etag("Building", 100, False, 0)
+    assert tag == changefeed.etag("Building", 100, False, 0)
+    assert tag != changefeed.etag("Building", 100, False, 1)
+    assert tag.startswith('W/"')
+    assert changefeed.etag_matches(f'"abc", {tag[2:]}', tag)
+    assert changefeed.etag_matches("*", tag)
+    assert not changefeed.etag_matches(None, tag)
+    assert not changefeed.etag_matches('W/"other"', tag)
@@ -0,0 +1,37 @@
+﻿import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from fastapi import Body, FastAPI
+from fastapi.testclient import TestClient
+import codec
+
+
+def test_dumps_matches_stdlib_output():
+    obj = {
+        "at": datetime(2025, 1, 2, 3, 4, 5, 678901),
+        "utc": datetime(2025, 1, 2, tzinfo=timezone.utc),
+        "day": date(2025, 1, 2),
+        "whole": Decimal("3.00"),
+        "part": Decimal("2.5"),
+        "name": "Café",
+        "none": None,
+    }
+    expected = json.dumps(obj, default=codec.default, ensure_ascii=False, separators=(",", ":"))
+    assert json.loads(codec.dumps(obj)) == json.loads(expected)
+    assert json.loads(codec.dumps(obj))["whole"] == 3
+    assert codec.dumps_line({"a": 1}).endswith(b"\n")
+
+def test_codec_route_parses_bodies_and_reports_bad_json():
+    app = FastAPI(default_response_class=codec.FastJSONResponse)
+    app.router.route_class = codec.CodecRoute
+
+    @app.post("/echo")
+    def echo(payload: dict = Body(...)):
+        return payload
+
+    client = TestClient(app)
+    r = client.post("/echo", json={"fields": {"Units": 4}})
+    assert r.status_code == 200 and r.json() == {"fields": {"Units": 4}}
+    r = client.post("/echo", content=b'{"fields": ', headers={"content-type": "application/json"})
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["type"] == "json_invalid"
@@ -0,0 +1,62 @@
+﻿import zlib
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from compression import CompressionMiddleware, CompressionStats, negotiate
+
+
+def _app(stats):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, stats=stats)
+
+    @app.get("/big")
+    def big():
+        return [{"building_id": i, "City": "Charleston"} for i in range(200)]
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        lines = (b'{"op":"upsert","data":{"building_id":%d}}\n' % i for i in range(300))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_negotiate_prefers_highest_q_then_server_order():
+    available = {"zstd": None, "br": None, "gzip": None}
+    assert negotiate("gzip, br", available) == "br"
+    assert negotiate("br;q=0.5, gzip", available) == "gzip"
+    assert negotiate("gzip;q=0, identity", available) is None
+    assert negotiate("*", {"gzip": None}) == "gzip"
+    assert negotiate(None) is None
+
+def test_large_bodies_are_compressed_and_small_ones_are_not():
+    stats = CompressionStats()
+    client = _app(stats)
+    r = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and "Accept-Encoding" in r.headers["vary"]
+    assert len(r.json()) == 200
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    r = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    s = stats.stats()
+    assert s["compressed"] == 1 and s["skipped_small"] == 1 and s["bytes_saved"] > 0
+
+def test_streaming_bodies_are_compressed_incrementally():
+    stats = CompressionStats()
+    client = _app(stats)
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        assert r.headers["content-encoding"] == "gzip" and "content-length" not in r.headers
+        raw = b"".join(r.iter_raw())
+    assert len(zlib.decompress(raw, 16 + zlib.MAX_WBITS).splitlines()) == 300
+    assert stats.stats()["streamed"] == 1
+
+def test_every_compressible_response_varies_on_accept_encoding():
+    client = _app(CompressionStats())
+    for path, accept in (("/small", "gzip"), ("/big", "identity"), ("/big", None), ("/big", "gzip")):
+        r = client.get(path, headers={"Accept-Encoding": accept} if accept else {})
+        assert [v.strip() for v in r.headers["vary"].split(",")].count("Accept-Encoding") == 1
@@ -0,0 +1,102 @@
+﻿import threading
+import time
+import pytest
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *params):
+        if self.conn.broken:
+            raise RuntimeError("connection is dead")
+        return self
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if self.broken:
+            raise RuntimeError("connection is dead")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kw):
+    created = []
+    def creator():
+        c = FakeConn()
+        created.append(c)
+        return c
+    return ConnectionPool(creator, **kw), created
+
+def test_reuses_connection_and_rolls_back_on_return():
+    pool, created = make_pool(size=2, max_overflow=0)
+    conn = pool.connect()
+    conn.close()
+    conn = pool.connect()
+    conn.close()
+    assert len(created) == 1
+    assert created[0].rollbacks == 2
+    assert pool.stats()["checkouts"] == 2
+
+def test_overflow_connections_are_closed_on_return():
+    pool, created = make_pool(size=1, max_overflow=1)
+    a, b = pool.connect(), pool.connect()
+    assert pool.stats()["overflow"] == 1
+    a.close(); b.close()
+    assert pool.stats()["idle"] == 1
+    assert sum(c.closed for c in created) == 1
+
+def test_wait_timeout_raises():
+    pool, _ = make_pool(size=1, max_overflow=0, timeout=0.05)
+    held = pool.connect()
+    with pytest.raises(PoolTimeout):
+        pool.connect()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+def test_waiter_gets_returned_connection():
+    pool, created = make_pool(size=1, max_overflow=0, timeout=2)
+    held = pool.connect()
+    threading.Timer(0.05, held.close).start()
+    conn = pool.connect()
+    conn.close()
+    assert len(created) == 1
+    assert pool.stats()["waits"] == 1
+
+def test_failed_health_check_replaces_connection():
+    pool, created = make_pool(size=1, max_overflow=0, ping_idle=0)
+    pool.connect().close()
+    created[0].broken = True
+    conn = pool.connect()
+    assert conn.raw is created[1]
+    assert pool.stats()["ping_failures"] == 1
+    conn.close()
+
+def test_max_lifetime_recycles_connection():
+    pool, created = make_pool(size=1, max_overflow=0, recycle=0.01)
+    pool.connect().close()
+    time.sleep(0.02)
+    pool.connect().close()
+    assert created[0].closed
+    assert pool.stats()["open"] <= 1
@@ -0,0 +1,205 @@
+﻿# Endpoint tests against the SQLite stand-in (benchmarks/standin_db.py); fixtures in conftest.py.
+# Every test works on its own building ids, since the database is shared by the session.
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from benchmarks import fake_airtable, standin_db
+from db_pool import ConnectionPool
+
+
+def test_bulk_change_leaves_pooled_connection_reporting_rowcounts(app_main, client):
+    app_main.db_pool.dispose()
+    app_main.db_pool.reopen()  # one connection, reused by both requests below
+
+    r = client.post("/buildings/soft-delete", json={"ids": [1]})
+    assert r.status_code == 200 and r.json()["soft_deleted"] == 1
+    created = app_main.db_pool.stats()["created"]
+    assert app_main.db_pool.stats()["idle"] == 1
+
+    r = client.post("/airtable/buildings/restore", json={"building_id": 1})
+    assert r.status_code == 200
+    assert r.json()["restored"] == 1
+    assert app_main.db_pool.stats()["created"] == created
+
+
+def test_building_controller_sync_reaches_airtable(app_main, airtable):
+    from controllers import building_controller  # imports main, so only once app_main has loaded it
+
+    app = FastAPI()
+    app.include_router(building_controller.router)
+    posts = airtable.requests["POST"]
+    with TestClient(app) as c:
+        r = c.post("/sync_buildings")
+    assert r.status_code == 200, r.text
+    assert airtable.requests["POST"] > posts
+
+
+def test_airtable_pull_keeps_buildings_at_one_address_apart(app_main, client, monkeypatch):
+    base = client.get("/buildings", params={"ids": "3"}).json()["records"][0]
+    fields = {k: base[k] for k in app_main.AIRTABLE_BUILDING_PULL_FIELDS if base.get(k) is not None}
+    fields["Address Normalized"] = base["address_normalized"]
+    filler = [{**fields, "Address Normalized": f"{n} Pull Test Rd", "bld_number": 1} for n in range(120)]
+    fake = fake_airtable.FakeAirtable().start()
+    try:
+        # Bld# 1 is on the first page, Bld# 2 of the same address on the second
+        fake.seed("airtable_Building", [{**fields, "bld_number": 1, "units": 11}] + filler
+                  + [{**fields, "bld_number": 2, "units": 22}, {"bld_number": 1}])
+        monkeypatch.setattr(app_main, "AIRTABLE_API_URL", fake.url)
+        r = client.get("/fetch_buildings_from_airtable/")
+    finally:
+        fake.stop()
+    assert r.status_code == 200, r.text
+    assert r.json() == {"message": "Fetch complete", "updated": 1, "inserted": 121, "skipped": 1}
+    assert fake.requests["GET"] == 2
+
+    assert client.get("/buildings", params={"ids": "3"}).json()["records"][0]["units"] == 11
+    cur = standin_db.connect(app_main.CONN_STR).cursor()
+    cur.execute("SELECT [Bld#], units FROM dbo.Building WHERE [Address Normalized] = ? ORDER BY [Bld#]",
+                [base["address_normalized"]])
+    assert [tuple(row) for row in cur.fetchall()] == [(1, 11), (2, 22)]
+
+
+def _new_building(app_main, street: str, **extra) -> dict:
+    fields = {k: 1 for k in app_main.REQUIRED_BUILDING_FIELDS}
+    fields.update(street_address=street, city="Testville", state="WV", zip_code="25000", county="Kanawha")
+    return {**fields, **extra}
+
+
+def test_batch_ingest_reports_repeated_keys_as_duplicates(app_main, client):
+    records = [
+        {"fields": _new_building(app_main, "1 Ingest Dup Way", units=5)},
+        {"fields": _new_building(app_main, "1 Ingest Dup Way", units=9)},
+        {"fields": _new_building(app_main, "1 Ingest Dup Way", bld_number=2)},
+        {"fields": _new_building(app_main, "2 Ingest Dup Way")},
+        {"fields": _new_building(app_main, "2 Ingest Dup Way")},
+    ]
+    body = client.post("/airtable/buildings/ingest", json={"records": records}).json()
+    assert (body["status"], body["created"], body["existing"], body["duplicates"], body["failed"]) == ("ok", 3, 0, 2, 0)
+    results = body["results"]
+    assert [r["status"] for r in results] == ["created", "duplicate", "created", "created", "duplicate"]
+    assert results[1]["duplicate_of"] == 0 and results[1]["building_id"] == results[0]["building_id"]
+    assert results[4]["duplicate_of"] == 3 and results[4]["building_id"] == results[3]["building_id"]
+    assert len({r["building_id"] for r in results}) == 3
+
+    first = client.get("/buildings", params={"ids": str(results[0]["building_id"])}).json()["records"][0]
+    assert first["units"] == 5  # the first copy's values, not the last
+
+    body = client.post("/airtable/buildings/ingest", json={"records": records[:2]}).json()
+    assert [r["status"] for r in body["results"]] == ["exists", "duplicate"]
+    assert (body["created"], body["existing"], body["duplicates"]) == (0, 1, 1)
+
+
+def test_batch_update_isolates_the_record_the_database_rejects(client):
+    assert client.post("/buildings/soft-delete", json={"ids": [24]}).json()["soft_deleted"] == 1
+    records = [
+        {"fields": {"building_id": 20, "units": 7}},
+        {"fields": {"building_id": 21, "bld_number": None}},  # NOT NULL: fails the whole executemany
+        {"fields": {"building_id": 22, "units": 8}},
+        {"fields": {"building_id": 99999, "units": 9}},
+        {"fields": {"units": 10}},
+        {"fields": {"building_id": 24, "units": 11}},
+    ]
+    body = client.post("/airtable/buildings/update", json={"records": records}).json()
+    assert (body["status"], body["updated"], body["failed"]) == ("partial", 2, 2)
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["status"] for r in results] == ["ok", "error", "ok", "ok", "error", "ok"]
+    assert [r.get("updated") for r in results] == [1, None, 1, 0, None, 0]
+    assert results[1]["error"].startswith("DB error")
+    assert results[4]["error"] == "building_id is required for updates"
+
+    rows = {r["building_id"]: r for r in client.get("/buildings", params={"ids": "20,21,22"}).json()["records"]}
+    assert (rows[20]["units"], rows[22]["units"]) == (7, 8)
+    assert rows[21]["bld_number"] is not None
+
+    # without a failure the counts come from the set-based UPDATEs' OUTPUT rows
+    records = [
+        {"fields": {"building_id": 25, "units": 3}},
+        {"fields": {"building_id": 25, "stories": 2}},
+        {"fields": {"building_id": 26, "units": 4}},
+        {"fields": {"building_id": 24, "units": 5}},
+        {"fields": {"building_id": 99999, "units": 6}},
+    ]
+    body = client.post("/airtable/buildings/update", json={"records": records}).json()
+    assert (body["status"], body["updated"], body["failed"]) == ("ok", 3, 0)
+    assert [r["updated"] for r in body["results"]] == [1, 1, 1, 0, 0]
+
+
+def test_bulk_delete_and_restore_partition_unchanged_and_not_found(client):
+    r = client.post("/buildings/soft-delete", json={"ids": [30, 31, 99998]}).json()
+    assert r == {"status": "ok", "soft_deleted": 2, "ids": [30, 31], "unchanged": [], "not_found": [99998]}
+
+    r = client.post("/buildings/soft-delete", json={"ids": [32, 30]}).json()
+    assert (r["soft_deleted"], r["ids"], r["unchanged"], r["not_found"]) == (1, [32], [30], [])
+
+    r = client.post("/buildings/restore", json={"ids": [30, 33, 99998]}).json()
+    assert (r["restored"], r["ids"], r["unchanged"], r["not_found"]) == (1, [30], [33], [99998])
+
+    r = client.post("/buildings/hard-delete", json={"ids": [31, 99998]}).json()
+    assert (r["hard_deleted"], r["ids"], r["unchanged"], r["not_found"]) == (1, [31], [], [99998])
+    assert client.get("/buildings", params={"ids": "30,31"}).json()["missing"] == [31]
+
+
+def test_ndjson_changes_pages_through_the_whole_feed(client):
+    client.post("/buildings/soft-delete", json={"ids": [40]})
+    full = client.get("/airtable/buildings/changes", params={"limit": 5000}).json()
+    expected = [("upsert", r["building_id"]) for r in full["upserts"]] + \
+               [("delete", r["building_id"]) for r in full["deletes"]]
+
+    seen, pages, cursor = [], 0, None
+    while True:
+        params = {"format": "ndjson", "limit": 7, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/airtable/buildings/changes", params=params)
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        end = lines.pop()
+        assert end["op"] == "end" and end["count"] == len(lines) <= 7
+        seen += [(line["op"], line["data"]["building_id"]) for line in lines]
+        pages += 1
+        cursor = end["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(expected)
+    assert ("delete", 40) in seen
+    assert pages == -(-len(expected) // 7)  # limit + 1 rows are read, so no trailing empty page
+
+
+def test_client_contact_fields_can_select_deletion_state_and_updated_at(client):
+    assert client.post("/clientcontacts/soft-delete", json={"ids": [3]}).json()["soft_deleted"] == 1
+    full = client.get("/clientcontacts/3").json()
+    part = client.get("/clientcontacts/3", params={"fields": "is_deleted,deleted_at,updated_at"})
+    assert part.status_code == 200, part.text
+    assert part.json() == {k: full[k] for k in ("client_contact_id", "is_deleted", "deleted_at", "updated_at")}
+
+    many = client.get("/clientcontacts", params={"ids": "3", "fields": "deleted_at"}).json()
+    assert many["records"] == [{"client_contact_id": 3, "deleted_at": full["deleted_at"]}]
+    assert client.get("/airtable/clientcontact/changes", params={"fields": "updated_at"}).status_code == 200
+
+
+class _NoSnapshotConnection(standin_db.Connection):
+    """A database without ALLOW_SNAPSHOT_ISOLATION: SNAPSHOT reads fail with error 3952."""
+    batches = []
+
+    def cursor(self):
+        cur = super().cursor()
+        execute = cur.execute
+
+        def checked(sql, *params):
+            self.batches.append(sql)
+            if "ISOLATION LEVEL SNAPSHOT" in sql:
+                raise standin_db.ProgrammingError("42000", "[42000] (3952) Snapshot isolation transaction failed")
+            return execute(sql, *params)
+        cur.execute = checked
+        return cur
+
+
+def test_all_changes_falls_back_from_snapshot_once_per_app(app_main, client, monkeypatch):
+    path = app_main.CONN_STR.split("=", 1)[1]
+    monkeypatch.setattr(app_main, "db_pool", ConnectionPool(lambda: _NoSnapshotConnection(path), size=1))
+    monkeypatch.setattr(client.app.state, "changes_snapshot", True, raising=False)
+    for _ in range(2):
+        r = client.get("/airtable/changes", params={"tables": "entity", "limit": 1})
+        assert r.status_code == 200 and "entity" in r.json()["tables"]
+    assert sum("SNAPSHOT" in sql for sql in _NoSnapshotConnection.batches) == 1
+    assert client.app.state.changes_snapshot is False
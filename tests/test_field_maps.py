@@ -0,0 +1,60 @@
+﻿import pytest
+from datetime import date, datetime
+from field_maps import BUILDING, BUILDING_CONTACT, CLIENT_CONTACT, ENTITY, FieldError
+
+
+def test_decode_accepts_airtable_labels_and_snake_case():
+    f = BUILDING.decode({"Bld#": 2, "Zip": "25301", " Street Address ": "1 Main", "year_built": 1990})
+    assert f == {"bld_number": 2, "zip_code": "25301", "street_address": "1 Main", "year_built": 1990}
+
+def test_to_sql_coerces_and_skips_read_only():
+    cols, vals = BUILDING.to_sql({"building_id": 4, "fire_alarm": "false", "owner_occupied": True, "city": "X"})
+    assert cols == ["Owner Occupied", "City", "Fire Alarm"]
+    assert vals == [1, "X", 0]
+
+def test_field_errors_name_the_column():
+    with pytest.raises(FieldError, match="State Registration must be 2 letters"):
+        ENTITY.to_sql(ENTITY.decode({"State Registration": "wva"}))
+    assert ENTITY.to_sql({"entity_start_date": "05/01/2024"}) == (["Entity Start Date"], [date(2024, 5, 1)])
+    assert CLIENT_CONTACT.to_sql(CLIENT_CONTACT.decode({"Email": " A@B.c "})) == (["email"], ["a@b.c"])
+
+def test_feed_encoder_upsert_and_delete():
+    ts = datetime(2025, 1, 1)
+    op, payload = BUILDING_CONTACT.feed_encoder((1, 2, 3, "owner", True, True, True, ts, "c"))
+    assert op == "upsert"
+    assert payload == {"building_contact_id": 1, "building_id": 2, "client_contact_id": 3, "role": "owner",
+                       "is_primary": 1, "is_active": 1, "updated_at": "2025-01-01T00:00:00"}
+    row = (9, "Acme", "WV", None, None, None, True, ts, "c")
+    assert ENTITY.feed_encoder(row) == ("delete", {"Entity_Id": 9, "updated_at": "2025-01-01T00:00:00"})
+
+def test_probe_query_covers_watched_tables():
+    sql = BUILDING.probe_query("b.[updated_at] > ?")
+    assert "COUNT_BIG(*)" in sql and "MAX(b.[updated_at])" in sql
+    assert "FROM dbo.[Entity]" in sql and "JOIN" not in sql
+    assert ENTITY.probe_query("e.[updated_at] > ?").count("SELECT") == 1
+
+def test_select_fields_narrows_feed_and_drops_unused_join():
+    view = BUILDING.select_fields("City, units")
+    assert [f.name for f in view.fields] == ["building_id", "city", "units"]
+    sql = view.feed_query("", "1 = 1")
+    assert "JOIN" not in sql and "[Street Address]" not in sql
+    assert "JOIN" in BUILDING.select_fields("Entity Legal Name").feed_query("", "1 = 1")
+    assert BUILDING.select_fields("city,units") is view
+    assert BUILDING.select_fields(None) is BUILDING
+
+def test_select_fields_picks_from_full_feed_rows():
+    ts = datetime(2025, 1, 1)
+    view = BUILDING_CONTACT.select_fields("role")
+    row = view.pick((1, 2, 3, "owner", True, True, True, ts, "c"))
+    assert view.feed_encoder(row) == ("upsert", {"building_contact_id": 1, "role": "owner",
+                                                 "updated_at": "2025-01-01T00:00:00"})
+    assert CLIENT_CONTACT.select_fields("Phone").record_names == ["client_contact_id", "phone"]
+    with pytest.raises(FieldError):
+        BUILDING.select_fields("city,nope")
+
+def test_records_query_reads_a_view_for_many_keys():
+    view = BUILDING.select_fields("city")
+    sql = view.records_query(3)
+    assert sql.startswith("SELECT b.[building_id] AS [building_id], b.[City] AS [city]")
+    assert sql.endswith("WHERE b.[building_id] IN (?, ?, ?)")
+    assert view.record_sql == sql.replace("IN (?, ?, ?)", "= ?")
@@ -0,0 +1,94 @@
+﻿import asyncio
+import httpx
+from fastapi import Body, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from idempotency import IdempotencyMiddleware, IdempotencyStore, record_key
+
+
+def _app(store):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=store)
+    calls = []
+
+    @app.post("/airtable/buildings/{op}")
+    def write(op: str, payload: dict = Body(...)):
+        calls.append(op)
+        if payload.get("fail"):
+            raise HTTPException(500, "DB error")
+        return {"op": op, "call": len(calls)}
+
+    return TestClient(app), calls
+
+
+def test_record_key_reads_airtable_ids():
+    assert record_key(b'{"id": "recA", "fields": {}}') == "airtable:recA"
+    assert record_key(b'{"records": [{"id": "recA"}, {"id": "recB"}]}') == "airtable:recA,recB"
+    assert record_key(b'{"building_id": 3}') is None
+    assert record_key(b"not json") is None
+
+def test_header_key_replays_and_refuses_other_bodies():
+    store = IdempotencyStore(10, ttl=60)
+    client, calls = _app(store)
+    first = client.post("/airtable/buildings/ingest", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    again = client.post("/airtable/buildings/ingest", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    assert again.json() == first.json() and again.headers["idempotent-replayed"] == "true"
+    assert client.post("/airtable/buildings/ingest", json={"a": 2}, headers={"Idempotency-Key": "k"}).status_code == 422
+    assert calls == ["ingest"]
+
+def test_record_id_key_lets_the_next_write_of_the_record_through():
+    store = IdempotencyStore(10, ttl=60)
+    client, calls = _app(store)
+    for op in ("delete", "restore", "delete", "delete"):
+        client.post(f"/airtable/buildings/{op}", json={"id": "recA", "building_id": 3})
+    assert calls == ["delete", "restore", "delete"]  # the last one is a retry
+
+def test_server_errors_are_not_kept():
+    store = IdempotencyStore(10, ttl=60)
+    client, calls = _app(store)
+    client.post("/airtable/buildings/update", json={"id": "recA", "fail": True})
+    client.post("/airtable/buildings/update", json={"id": "recA", "fail": True})
+    assert calls == ["update", "update"]
+    assert store.stats()["stored"] == 0
+
+def test_entries_expire_and_other_paths_pass_through():
+    now = [0.0]
+    store = IdempotencyStore(10, ttl=5, clock=lambda: now[0])
+    client, calls = _app(store)
+    client.post("/airtable/buildings/ingest", json={"id": "recA"})
+    now[0] = 5.0
+    client.post("/airtable/buildings/ingest", json={"id": "recA"})
+    assert calls == ["ingest", "ingest"] and store.stats()["expirations"] == 1
+    client.post("/airtable/buildings/changes", json={"id": "recA"})
+    client.post("/airtable/buildings/changes", json={"id": "recA"})
+    assert calls.count("changes") == 2
+
+def test_retry_of_a_running_write_waits_even_when_the_record_has_an_entry():
+    store = IdempotencyStore(10, ttl=60)
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=store)
+    calls, release = [], asyncio.Event()
+
+    @app.post("/airtable/buildings/update")
+    async def write(payload: dict = Body(...)):
+        calls.append(payload["units"])
+        if payload["units"] == 2:
+            await release.wait()
+        return {"status": "ok", "call": len(calls)}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            await client.post("/airtable/buildings/update", json={"id": "recA", "units": 1})
+            first = asyncio.create_task(client.post("/airtable/buildings/update", json={"id": "recA", "units": 2}))
+            while len(calls) < 2:
+                await asyncio.sleep(0)
+            retry = asyncio.create_task(client.post("/airtable/buildings/update", json={"id": "recA", "units": 2}))
+            await asyncio.sleep(0.01)
+            release.set()
+            return await first, await retry
+
+    first, retry = asyncio.run(run())
+    assert calls == [1, 2]
+    assert first.json() == retry.json() == {"status": "ok", "call": 2}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert store.stats()["waits"] == 1
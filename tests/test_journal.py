@@ -0,0 +1,78 @@
+﻿import changefeed
+from field_maps import ENTITY
+from journal import ChangeJournal
+
+
+def _row(pk, second):
+    row = [None] * (ENTITY.feed_cursor_index + 1)
+    row[ENTITY.feed_pk_index] = pk
+    row[ENTITY.feed_cursor_index] = f"2025-01-01T00:00:{second:02d}.0000000"
+    return tuple(row)
+
+def _summary(rows):
+    keys = [(r[ENTITY.feed_cursor_index], r[ENTITY.feed_pk_index]) for r in rows]
+    return len(keys), max(keys)[0] if keys else None, sum(changefeed.row_checksum(*k) for k in keys)
+
+NOW = "2025-01-01T00:01:00.0000000"
+
+
+def test_unseeded_table_misses():
+    journal = ChangeJournal(10)
+    assert journal.page(ENTITY, None, NOW, 5) is None
+    assert journal.needs_seed(ENTITY)
+
+def test_page_orders_by_keyset_and_verifies_against_probe():
+    journal = ChangeJournal(10)
+    rows = [_row(pk, 10 + pk) for pk in range(1, 6)]
+    journal.seed(ENTITY, rows, complete=True)
+    page = journal.page(ENTITY, (rows[1][ENTITY.feed_cursor_index], 2), NOW, 2)
+    assert [r[ENTITY.feed_pk_index] for r in page.rows] == [3, 4, 5]  # limit + look-ahead
+    assert journal.verify(ENTITY, page, _summary(rows[2:]))
+
+def test_record_replaces_older_version():
+    journal = ChangeJournal(10)
+    journal.seed(ENTITY, [_row(1, 1), _row(2, 2)], complete=True)
+    journal.record(ENTITY, [_row(1, 30)])
+    journal.record(ENTITY, [_row(1, 20)])  # slower re-read of an older version
+    page = journal.page(ENTITY, None, NOW, None)
+    assert [r[ENTITY.feed_pk_index] for r in page.rows] == [2, 1]
+    assert page.rows[1][ENTITY.feed_cursor_index].startswith("2025-01-01T00:00:30")
+    journal.record(ENTITY, [], removed=[2])
+    assert len(journal.page(ENTITY, None, NOW, None).rows) == 1
+
+def test_pages_below_the_floor_go_to_sql():
+    journal = ChangeJournal(3)
+    journal.seed(ENTITY, [_row(pk, pk) for pk in range(1, 5)], complete=False)
+    assert journal.page(ENTITY, None, NOW, 10) is None
+    assert journal.page(ENTITY, (_row(1, 1)[ENTITY.feed_cursor_index], float("inf")), NOW, 10) is not None
+    journal.record(ENTITY, [_row(9, 50)])  # evicts pk 2 and raises the floor
+    assert journal.page(ENTITY, (_row(1, 1)[ENTITY.feed_cursor_index], float("inf")), NOW, 10) is None
+
+def test_probe_mismatch_invalidates():
+    journal = ChangeJournal(10)
+    rows = [_row(1, 1), _row(2, 2)]
+    journal.seed(ENTITY, rows, complete=True)
+    page = journal.page(ENTITY, None, NOW, None)
+    assert not journal.verify(ENTITY, page, _summary(rows + [_row(3, 3)]))
+    assert journal.page(ENTITY, None, NOW, None) is None
+    assert journal.stats()["mismatches"] == 1
+
+def test_watched_values_must_match_unless_written_here():
+    journal = ChangeJournal(10)
+    rows = [_row(1, 1)]
+    journal.seed(ENTITY, rows, complete=True, watch=("w1",))
+    assert journal.verify(ENTITY, journal.page(ENTITY, None, NOW, None), _summary(rows) + ("w1",))
+    journal.watch_changed(ENTITY)
+    assert journal.verify(ENTITY, journal.page(ENTITY, None, NOW, None), _summary(rows) + ("w2",))
+    assert not journal.verify(ENTITY, journal.page(ENTITY, None, NOW, None), _summary(rows) + ("w3",))
+
+def test_summary_checksum_tracks_writes_drops_and_evictions():
+    journal = ChangeJournal(6)
+    journal.seed(ENTITY, [_row(pk, pk) for pk in range(1, 5)], complete=True)
+    journal.record(ENTITY, [_row(2, 40), _row(7, 41)], removed=[3])
+    journal.record(ENTITY, [_row(8, 42), _row(9, 43), _row(10, 44)])  # evicts pk 1
+    held = [_row(4, 4), _row(2, 40), _row(7, 41), _row(8, 42), _row(9, 43), _row(10, 44)]
+    for i in range(len(held)):
+        bound = (held[i][ENTITY.feed_cursor_index], held[i][ENTITY.feed_pk_index])
+        page = journal.page(ENTITY, bound, NOW, 1)
+        assert page.summary == _summary(held[i + 1:])
@@ -0,0 +1,152 @@
+﻿import asyncio
+import httpx
+from fastapi import FastAPI
+from db_pool import ConnectionPool
+from metrics import MetricsMiddleware, Registry, observe_db
+import metrics
+
+
+class FakeCursor:
+    def execute(self, sql, *params):
+        if sql == "boom":
+            raise RuntimeError("bad statement")
+        return self
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConn:
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_render_text_format():
+    reg = Registry()
+    calls = reg.counter("calls_total", "Calls", ("op",))
+    lat = reg.histogram("lat_seconds", "Latency", ("op",), buckets=(0.1, 1))
+    calls.inc("a")
+    calls.inc("a", amount=2)
+    lat.observe(0.05, "a")
+    lat.observe(0.5, "a")
+    lat.observe(5, "a")
+    reg.collector(lambda: [("up", "gauge", "Up", [({"host": 'x"y'}, 1)])])
+    lines = reg.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{op="a"} 3' in lines
+    assert 'lat_seconds_bucket{op="a",le="0.1"} 1' in lines
+    assert 'lat_seconds_bucket{op="a",le="1"} 2' in lines
+    assert 'lat_seconds_bucket{op="a",le="+Inf"} 3' in lines
+    assert 'lat_seconds_count{op="a"} 3' in lines
+    assert 'up{host="x\\"y"} 1' in lines
+
+def test_requests_and_statements_are_labelled_by_route():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0, timer=observe_db)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/things/{thing_id}")
+    def read_thing(thing_id: int):
+        conn = pool.connect()
+        try:
+            cur = conn.cursor()
+            row = cur.execute("SELECT 1").fetchone()
+            try:
+                cur.execute("boom")
+            except RuntimeError:
+                pass
+            return {"id": thing_id, "one": row[0]}
+        finally:
+            conn.close()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            assert (await c.get("/things/1")).json() == {"id": 1, "one": 1}
+            await c.get("/things/2")
+            await c.get("/nowhere")
+
+    route = "/things/{thing_id}"
+    before = metrics.DB_STATEMENTS.value(route)[0], metrics.DB_STATEMENT_ERRORS.value(route)
+    asyncio.run(run())
+    assert metrics.HTTP_REQUESTS.value("GET", route, "200")[0] >= 2
+    assert metrics.HTTP_REQUESTS.value("GET", "unmatched", "404")[0] >= 1
+    assert metrics.DB_STATEMENTS.value(route)[0] == before[0] + 4
+    assert metrics.DB_STATEMENT_ERRORS.value(route) == before[1] + 2
+
+def test_server_timing_header_lists_request_phases():
+    pool = ConnectionPool(FakeConn, size=1, max_overflow=0, timer=observe_db)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.post("/save")
+    def save():
+        conn = pool.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute("UPDATE t SET x = 1")
+            cur.execute("SELECT 1").fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        return {"ok": True}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            return await c.post("/save")
+
+    timing = asyncio.run(run()).headers["server-timing"]
+    phases = [part.split(";")[0] for part in timing.split(", ")]
+    assert phases == ["connect", "execute", "fetch", "commit", "total"]
+    assert 'execute;dur=' in timing and 'desc="2 statements"' in timing
+
+def test_slow_requests_are_logged(caplog):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, slow_ms=0)
+
+    @app.get("/slow")
+    def slow():
+        return {"ok": True}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            await c.get("/slow")
+
+    with caplog.at_level("WARNING", logger="metrics"):
+        asyncio.run(run())
+    assert [r.getMessage().split()[:4] for r in caplog.records] == [["slow", "request:", "GET", "/slow"]]
+
+def test_in_flight_gauge_is_registered_once_and_counts_every_app():
+    release, apps = asyncio.Event(), []
+    for _ in range(2):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/hold")
+        async def hold():
+            await release.wait()
+            return {"ok": True}
+        apps.append(app)
+
+    async def run():
+        clients = [httpx.AsyncClient(transport=httpx.ASGITransport(app=a), base_url="http://t") for a in apps]
+        calls = [asyncio.create_task(c.get("/hold")) for c in clients]
+        await asyncio.sleep(0.05)
+        text = metrics.REGISTRY.render()
+        release.set()
+        await asyncio.gather(*calls)
+        for c in clients:
+            await c.aclose()
+        return text
+
+    text = asyncio.run(run())
+    assert text.count("# TYPE http_requests_in_flight gauge") == 1
+    assert 'http_requests_in_flight{route="/hold"} 2' in text.splitlines()
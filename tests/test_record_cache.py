@@ -0,0 +1,65 @@
+﻿from record_cache import RecordCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _filled(cache, table, key, variant=None, joined=False):
+    return cache.put(table, key, variant, f'W/"{key}"', b"{}", cache.token(table), joined=joined)
+
+
+def test_hit_after_fill_and_lru_eviction():
+    cache = RecordCache(2, ttl=10)
+    for key in (1, 2):
+        assert _filled(cache, "Building", key)
+    assert cache.get("Building", 1) == ('W/"1"', b"{}")  # 1 becomes most recent
+    _filled(cache, "Building", 3)
+    assert cache.get("Building", 2) is None
+    assert cache.get("Building", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = RecordCache(10, ttl=5, clock=clock)
+    _filled(cache, "Entity", 1)
+    clock.now = 4.9
+    assert cache.get("Entity", 1) is not None
+    clock.now = 5.0
+    assert cache.get("Entity", 1) is None
+    assert cache.stats()["expirations"] == 1
+
+def test_invalidate_drops_every_field_selection():
+    cache = RecordCache(10, ttl=10)
+    _filled(cache, "Building", 1)
+    _filled(cache, "Building", 1, variant=("building_id", "city"))
+    _filled(cache, "Building", 2)
+    cache.invalidate("Building", [1])
+    assert cache.get("Building", 1) is None
+    assert cache.get("Building", 1, ("building_id", "city")) is None
+    assert cache.get("Building", 2) is not None
+
+def test_fill_read_before_an_invalidation_is_dropped():
+    cache = RecordCache(10, ttl=10)
+    token = cache.token("ClientContact")
+    cache.invalidate("ClientContact", [7])  # write committed while the read was in flight
+    assert not cache.put("ClientContact", 7, None, 'W/"old"', b"{}", token)
+    assert cache.get("ClientContact", 7) is None
+    assert cache.stats()["stale_fills"] == 1
+
+def test_invalidate_joined_keeps_plain_entries():
+    cache = RecordCache(10, ttl=10)
+    _filled(cache, "Building", 1, joined=True)
+    _filled(cache, "Building", 1, variant=("building_id", "city"))
+    cache.invalidate_joined("Building")
+    assert cache.get("Building", 1) is None
+    assert cache.get("Building", 1, ("building_id", "city")) is not None
+
+def test_disabled_cache_never_stores():
+    cache = RecordCache(0, ttl=10)
+    assert not _filled(cache, "Building", 1)
+    assert cache.get("Building", 1) is None